@@ -0,0 +1,192 @@
+import argparse
+import re
+from pathlib import Path
+
+import numpy as np
+
+ANSWER_INDEX_FILE = "faq_answer_index.npz"
+
+# keeps ratios, times and decimals such as "15:1" or "3.5" as one token
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[:.][0-9]+)*")
+PHRASE_RE = re.compile(r'"([^"]+)"')
+
+# dropped from the loose (unquoted) part of a query; phrases keep every word
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from have how i in is it me my of on or
+the there to uet taxila what when where which who will with you your
+""".split())
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+# ----------------------------- ANSWER INDEX -----------------------------
+class AnswerIndex:
+    """Positional inverted index over FAQ answer text, scored with BM25.
+
+    Postings are stored CSR-style in flat integer arrays: the postings of
+    term ``t`` are ``docs[term_ptr[t]:term_ptr[t + 1]]`` (with matching
+    ``tfs``), and the positions of posting ``p`` are
+    ``positions[pos_ptr[p]:pos_ptr[p + 1]]``. ``checksum`` identifies the
+    answers it was built from (see faq_index.texts_checksum).
+    """
+
+    def __init__(self, vocab, term_ptr, docs, tfs, pos_ptr, positions, doc_len, k1=1.2, b=0.75,
+                 checksum=None):
+        self.vocab = vocab
+        self.term_ptr = term_ptr
+        self.docs = docs
+        self.tfs = tfs
+        self.pos_ptr = pos_ptr
+        self.positions = positions
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        self.checksum = checksum
+        self.n_docs = len(doc_len)
+        self.avg_len = float(doc_len.mean()) if self.n_docs else 0.0
+
+    @classmethod
+    def build(cls, texts, checksum=None):
+        postings = {}
+        doc_len = np.zeros(len(texts), dtype=np.int32)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_len[doc] = len(tokens)
+            for pos, token in enumerate(tokens):
+                per_doc = postings.setdefault(token, {})
+                per_doc.setdefault(doc, []).append(pos)
+
+        terms = sorted(postings)
+        vocab = {t: i for i, t in enumerate(terms)}
+        term_ptr = [0]
+        docs, tfs, pos_ptr, positions = [], [], [0], []
+        for t in terms:
+            for doc, pos in sorted(postings[t].items()):
+                docs.append(doc)
+                tfs.append(len(pos))
+                positions.extend(pos)
+                pos_ptr.append(len(positions))
+            term_ptr.append(len(docs))
+
+        return cls(
+            vocab,
+            np.array(term_ptr, dtype=np.int32),
+            np.array(docs, dtype=np.int32),
+            np.array(tfs, dtype=np.int32),
+            np.array(pos_ptr, dtype=np.int32),
+            np.array(positions, dtype=np.int32),
+            doc_len,
+            checksum=checksum,
+        )
+
+    def save(self, path):
+        terms = np.array(sorted(self.vocab, key=self.vocab.get))
+        np.savez_compressed(
+            path, terms=terms, term_ptr=self.term_ptr, docs=self.docs, tfs=self.tfs,
+            pos_ptr=self.pos_ptr, positions=self.positions, doc_len=self.doc_len,
+            checksum=np.array(self.checksum or ""),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            vocab = {str(t): i for i, t in enumerate(z["terms"])}
+            checksum = str(z["checksum"]) if "checksum" in z.files else None
+            return cls(vocab, z["term_ptr"], z["docs"], z["tfs"], z["pos_ptr"],
+                       z["positions"], z["doc_len"], checksum=checksum or None)
+
+    def nbytes(self):
+        arrays = (self.term_ptr, self.docs, self.tfs, self.pos_ptr, self.positions, self.doc_len)
+        return sum(a.nbytes for a in arrays)
+
+    def _postings(self, term):
+        t = self.vocab.get(term)
+        if t is None:
+            return slice(0, 0)
+        return slice(self.term_ptr[t], self.term_ptr[t + 1])
+
+    def _phrase_docs(self, tokens):
+        """Documents containing ``tokens`` as consecutive words"""
+        spans = [self._postings(t) for t in tokens]
+        if any(s.start == s.stop for s in spans):
+            return np.empty(0, dtype=np.int32)
+        candidates = self.docs[spans[0]]
+        for s in spans[1:]:
+            candidates = np.intersect1d(candidates, self.docs[s], assume_unique=True)
+
+        hits = []
+        for doc in candidates:
+            starts = None
+            for offset, s in enumerate(spans):
+                p = s.start + int(np.searchsorted(self.docs[s], doc))
+                pos = self.positions[self.pos_ptr[p]:self.pos_ptr[p + 1]] - offset
+                starts = pos if starts is None else np.intersect1d(starts, pos, assume_unique=True)
+                if not len(starts):
+                    break
+            if len(starts):
+                hits.append(doc)
+        return np.array(hits, dtype=np.int32)
+
+    def search(self, query, k=5):
+        """Top ``k`` answers for ``query`` as (row, score).
+
+        Quoted parts of the query are phrases: an answer must contain each
+        of them word for word. All words, quoted or not, add to the BM25 score.
+        """
+        phrases = [tokenize(p) for p in PHRASE_RE.findall(query)]
+        terms = set(tokenize(PHRASE_RE.sub(" ", query))) - STOPWORDS
+        for p in phrases:
+            terms.update(p)
+
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / max(self.avg_len, 1e-9))
+        for term in terms:
+            s = self._postings(term)
+            docs = self.docs[s]
+            if not len(docs):
+                continue
+            idf = np.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            tf = self.tfs[s]
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+
+        for p in phrases:
+            if not p:
+                continue
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            allowed[self._phrase_docs(p)] = True
+            scores[~allowed] = 0.0
+
+        hits = np.flatnonzero(scores > 0)
+        if not len(hits):
+            return []
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        return [(int(r), float(scores[r])) for r in top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search over FAQ answers")
+    parser.add_argument("--data", default="embeddings")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help=f"write {ANSWER_INDEX_FILE} into the index directory")
+    search = sub.add_parser("search", help='query the answers; quote phrases: \'"15:1" ratio\'')
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    from faq_index import FAQIndex, texts_checksum
+    index = FAQIndex(args.data)
+    if args.command == "build":
+        out = Path(args.data) / ANSWER_INDEX_FILE
+        answer_index = AnswerIndex.build(index.answers, texts_checksum(index.answers))
+        answer_index.save(out)
+        print(f"{len(answer_index.vocab)} terms, {len(answer_index.docs)} postings, "
+              f"{answer_index.nbytes() / 1024:.1f} KiB -> {out}")
+        return
+    for row, score in index.answer_index.search(args.query, args.k):
+        print(f"{score:6.2f}  {index.questions[row]}\n        {index.answers[row]}")
+
+
+if __name__ == "__main__":
+    main()
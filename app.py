@@ -1,13 +1,26 @@
 import streamlit as st
-import pickle
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from pathlib import Path
+import os
 import time
 import base64
+import uuid
+import conversation
+from query_log import DEFAULT_DB as DEFAULT_QUERY_LOG, QueryLog
+from session_store import SessionStore, export_html, export_json
+from startup import get_index_loader, reset_index_loader
+from profiling import NullProfiler, RerunProfiler
+
+# ----------------------------- PROFILING -----------------------------
+# Opt in with FAQ_PROFILE=1; otherwise every profiler call below is a no-op
+@st.cache_resource(show_spinner=False)
+def get_profiler():
+    """One profiler aggregating every rerun of every session in this process"""
+    return RerunProfiler()
+
+profiler = get_profiler() if os.environ.get("FAQ_PROFILE") == "1" else NullProfiler()
+profiler.begin()
 
 # ----------------------------- PAGE CONFIG -----------------------------
+profiler.mark("page_config")
 st.set_page_config(
     page_title="UET Taxila AI Chatbot", 
     page_icon="🎓", 
@@ -15,7 +28,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# ----------------------------- INDEX WARMUP -----------------------------
+profiler.mark("index_warmup")
+index_loader = get_index_loader()
+
 # ----------------------------- IMAGE LOADING FUNCTION -----------------------------
+profiler.mark("images")
+@st.cache_data
 def get_image_base64(image_path):
     """Convert image to base64 for embedding"""
     try:
@@ -31,6 +50,7 @@ header_base64 = get_image_base64("images/header.jpg")
 footer_base64 = get_image_base64("images/images.jpg")
 
 # ----------------------------- CUSTOM STYLING -----------------------------
+profiler.mark("css")
 st.markdown("""
 <style>
 @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
@@ -298,6 +318,37 @@ input[type="text"]:focus {
     word-wrap: break-word;
 }
 
+/* RELATED ANSWERS */
+.related-answers {
+    background: #ffffff;
+    padding: 15px 20px;
+    border-radius: 8px;
+    margin: -10px 0 20px 0;
+    border-left: 5px solid #d4af37;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.08);
+}
+
+.related-item {
+    padding: 8px 0;
+    border-bottom: 1px solid #e8e8e8;
+}
+
+.related-item:last-child {
+    border-bottom: none;
+}
+
+.related-question {
+    font-size: clamp(13px, 2vw, 14px);
+    font-weight: 600;
+    color: #2c5f8d;
+}
+
+.related-answer {
+    font-size: clamp(12px, 2vw, 14px);
+    color: #555;
+    line-height: 1.6;
+}
+
 /* CHAT SECTION */
 .chat-section {
     background: #ffffff;
@@ -649,6 +700,7 @@ section[data-testid="stSidebar"] .stButton>button:hover {
 """, unsafe_allow_html=True)
 
 # ----------------------------- HEADER -----------------------------
+profiler.mark("header")
 logo_html = f'<img src="data:image/png;base64,{logo_base64}" alt="UET Logo">' if logo_base64 else '<div style="width:70px;height:70px;background:#2c5f8d;border-radius:50%;display:flex;align-items:center;justify-content:center;color:white;font-weight:bold;">UET</div>'
 
 st.markdown(f"""
@@ -670,6 +722,7 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # ----------------------------- CAMPUS SHOWCASE -----------------------------
+profiler.mark("showcase")
 about_img = f'data:image/jpg;base64,{about_base64}' if about_base64 else 'https://via.placeholder.com/400x200/2c5f8d/ffffff?text=Campus+View'
 header_img = f'data:image/jpg;base64,{header_base64}' if header_base64 else 'https://via.placeholder.com/400x200/3a7bb5/ffffff?text=Main+Building'
 footer_img = f'data:image/jpg;base64,{footer_base64}' if footer_base64 else 'https://via.placeholder.com/400x200/2c5f8d/ffffff?text=University+Gate'
@@ -692,6 +745,7 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # ----------------------------- STATS SECTION -----------------------------
+profiler.mark("stats")
 st.markdown("""
 <div class='stats-section'>
     <div class='stats-grid'>
@@ -716,28 +770,46 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ----------------------------- LOAD DATA -----------------------------
+profiler.mark("load_data")
 try:
-    data_path = Path("embeddings")
-    answers = pickle.load(open(data_path/"faq_answers.pkl", "rb"))
-    questions = pickle.load(open(data_path/"faq_questions.pkl", "rb"))
-    intents = pickle.load(open(data_path/"faq_intents.pkl", "rb"))
-    categories = pickle.load(open(data_path/"faq_categories.pkl", "rb"))
-
-    vectorizer = TfidfVectorizer().fit(questions)
-    q_vecs = vectorizer.transform(questions)
+    if index_loader.ready:
+        registry = index_loader.get()
+    else:
+        with st.spinner("⏳ Loading FAQ knowledge base..."):
+            registry = index_loader.get()
+
+    # ?kb=<name> pins a knowledge base, ?kb=all searches every one of them;
+    # otherwise each question is routed by its predicted category
+    kb_param = st.query_params.get("kb")
+    fan_out = kb_param == "all"
+    kb = registry.route(kb_param)
+    index = registry.get(kb)
+    answers = index.answers
+    questions = index.questions
+    intents = index.intents
+    categories = index.categories
 except Exception as e:
+    # drop the failed loader so the next rerun tries again
+    reset_index_loader(index_loader)
     st.error(f"⚠️ Error loading data files: {e}")
     st.stop()
 
-manual = {
-    "hello": "👋 Hello! Welcome to UET Taxila AI Assistant. How can I help you today?",
-    "hi": "👋 Hi there! Feel free to ask anything about UET Taxila.",
-    "how are you": "🤖 I'm functioning perfectly and ready to assist you anytime!",
-    "thanks": "😊 You're welcome! Feel free to ask more questions.",
-    "thank you": "😊 Happy to help! Let me know if you need anything else.",
-}
+@st.cache_resource
+def get_query_log():
+    """One background log writer shared by every session of this process; FAQ_QUERY_LOG overrides the path"""
+    return QueryLog(os.environ.get("FAQ_QUERY_LOG") or DEFAULT_QUERY_LOG)
+
+query_log = get_query_log()
+
+@st.cache_resource
+def get_session_store():
+    """Chat persistence shared by every session; only used when FAQ_SESSION_DB is set"""
+    return SessionStore(os.environ["FAQ_SESSION_DB"])
+
+session_store = get_session_store() if os.environ.get("FAQ_SESSION_DB") else None
 
 # ----------------------------- SESSION STATES -----------------------------
+profiler.mark("session_state")
 if "history" not in st.session_state:
     st.session_state.history = []
 if "user_q" not in st.session_state:
@@ -752,29 +824,32 @@ if "animate" not in st.session_state:
     st.session_state.animate = False
 if "form_key" not in st.session_state:
     st.session_state.form_key = 0
+if "session_id" not in st.session_state:
+    # with persistence on, ?session=<token> in the URL resumes that conversation on reload
+    token = st.query_params.get("session", "") if session_store else ""
+    if len(token) == 32 and all(c in "0123456789abcdef" for c in token):
+        st.session_state.session_id = token
+        st.session_state.history = session_store.load(token)
+    else:
+        st.session_state.session_id = uuid.uuid4().hex
+    if session_store:
+        st.query_params["session"] = st.session_state.session_id
+if "context" not in st.session_state:
+    st.session_state.context = None
+if "related" not in st.session_state:
+    st.session_state.related = []
+if "suggestions" not in st.session_state:
+    st.session_state.suggestions = []
 
 # ----------------------------- ANSWER FUNCTION -----------------------------
 def get_answer(q):
-    q_low = q.lower().strip()
-    
-    for k, v in manual.items():
-        if k in q_low:
-            return v
-    
-    previous = [x[1].lower().strip() for x in st.session_state.history if x[0] == "You"]
-    if q_low in previous:
-        return "⚠️ You already asked this question. Please check the chat history below."
-    
-    vec = vectorizer.transform([q])
-    sims = cosine_similarity(vec, q_vecs)[0]
-    best = np.argmax(sims)
-    
-    if sims[best] < 0.35:
-        return "❌ Sorry, I don't have an answer for that specific question. Please try rephrasing or ask about admissions, programs, scholarships, hostels, or fee structure."
-    
-    return answers[best]
+    # the answer path lives in conversation.py so load_test.py drives the same code
+    return conversation.get_answer(q, st.session_state, registry, query_log, kb_param)
 # ----------------------------- SIDEBAR -----------------------------
+profiler.mark("sidebar")
 st.sidebar.markdown("<h2 style='text-align: center; margin-bottom: 20px; color: #ffffff;'>FAQ Categories</h2>", unsafe_allow_html=True)
+if len(registry.names()) > 1:
+    st.sidebar.markdown(f"<p style='text-align: center; color: #ffffff;'>📚 {'All knowledge bases' if fan_out else registry.title(kb)}</p>", unsafe_allow_html=True)
 
 unique_cats = ["All"] + sorted(list(set(categories)))
 st.sidebar.markdown("""
@@ -834,12 +909,28 @@ if len(cat_ids) > 5:
 
 st.sidebar.markdown("<div style='margin: 20px 0; border-top: 2px solid rgba(255,255,255,0.3);'></div>", unsafe_allow_html=True)
 
+if st.session_state.history:
+    st.sidebar.download_button(
+        "⬇️ Export Chat (JSON)", export_json(st.session_state.history),
+        file_name="uet_chat.json", mime="application/json", key="export_json_btn"
+    )
+    st.sidebar.download_button(
+        "⬇️ Export Chat (HTML)", export_html(st.session_state.history),
+        file_name="uet_chat.html", mime="text/html", key="export_html_btn"
+    )
+
 if st.sidebar.button("🗑️ Clear Chat", key="clear_btn"):
+    if session_store:
+        session_store.clear(st.session_state.session_id)
     st.session_state.history = []
     st.session_state.latest_answer = None
     st.session_state.history_count = 10
+    st.session_state.context = None
+    st.session_state.related = []
+    st.session_state.suggestions = []
     st.rerun()
 # ----------------------------- INFO BANNER -----------------------------
+profiler.mark("info_banner")
 st.markdown("""
 <div class='info-banner'>
     <strong>💡 How to use:</strong> Type your question below or select from sample questions in the sidebar. Get instant answers about admissions, programs, scholarships, hostels, fees, and more!
@@ -847,6 +938,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ----------------------------- INPUT SECTION -----------------------------
+profiler.mark("input")
 st.markdown("<div class='input-section'>", unsafe_allow_html=True)
 st.markdown("<div class='section-title'>💬 Ask Your Question</div>", unsafe_allow_html=True)
 
@@ -868,22 +960,30 @@ st.markdown("</div>", unsafe_allow_html=True)
 
 
 # ----------------------------- PROCESS QUESTION -----------------------------
+profiler.mark("process_question")
 if clear_input:
     st.session_state.user_q = ""
     st.session_state.form_key += 1
     st.rerun()
 
 if submitted and user_q.strip():
+    profiler.mark("answer")
     reply = get_answer(user_q.strip())
+    profiler.mark("process_question")
     st.session_state.latest_answer = reply
     st.session_state.history.append(("You", user_q.strip()))
     st.session_state.history.append(("Bot", reply))
+    if session_store:
+        n = len(st.session_state.history)
+        session_store.append(st.session_state.session_id, n - 2, "You", user_q.strip())
+        session_store.append(st.session_state.session_id, n - 1, "Bot", reply)
     st.session_state.user_q = ""
     st.session_state.animate = True
     st.session_state.form_key += 1
     st.rerun()
 
 # ----------------------------- LATEST ANSWER -----------------------------
+profiler.mark("latest_answer")
 if st.session_state.latest_answer:
     latest_text = st.session_state.latest_answer
     placeholder = st.empty()
@@ -908,7 +1008,28 @@ if st.session_state.latest_answer:
         </div>
         """, unsafe_allow_html=True)
 
+    if st.session_state.related:
+        items = "".join(
+            f"<div class='related-item'><div class='related-question'>{rq}</div>"
+            f"<div class='related-answer'>{ra}</div></div>"
+            for rq, ra in st.session_state.related
+        )
+        st.markdown(f"""
+        <div class='related-answers'>
+            <div class='answer-header'>📎 Related Answers</div>
+            {items}
+        </div>
+        """, unsafe_allow_html=True)
+
+    if st.session_state.suggestions:
+        st.markdown("<div class='answer-header'>🔗 People Also Asked</div>", unsafe_allow_html=True)
+        for n, sq in enumerate(st.session_state.suggestions):
+            if st.button(f"❓ {sq}", key=f"suggestion_{n}"):
+                st.session_state.user_q = sq
+                st.rerun()
+
 # ----------------------------- CHAT HISTORY -----------------------------
+profiler.mark("history")
 if st.session_state.history:
     st.markdown("<div class='chat-section'>", unsafe_allow_html=True)
     st.markdown("<div class='section-title'>💬 Conversation History</div>", unsafe_allow_html=True)
@@ -943,6 +1064,7 @@ if st.session_state.history:
     st.markdown("</div>", unsafe_allow_html=True)
 
 # ----------------------------- FOOTER -----------------------------
+profiler.mark("footer")
 st.markdown("""
 <div class='footer'>
     <div class='footer-title'>University of Engineering & Technology, Taxila</div>
@@ -959,4 +1081,16 @@ st.markdown("""
         © 2026 UET Taxila | Powered by AI Technology
     </div>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# ----------------------------- PROFILER SIDEBAR -----------------------------
+profiler.end()
+if profiler.enabled:
+    with st.sidebar.expander("🛠️ Rerun Profile", expanded=False):
+        st.markdown(f"**{profiler.runs} reruns profiled**")
+        st.table([
+            {"section": s, "runs": n, "mean ms": f"{mean:.2f}", "max ms": f"{mx:.2f}", "share": f"{share:.0%}"}
+            for s, n, mean, mx, share in profiler.table()
+        ])
+        if st.button("💾 Write flame data", key="profile_write_btn"):
+            st.success(f"Collapsed stacks written to {profiler.write()}")
@@ -0,0 +1,73 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+# Each probe runs in a fresh interpreter so nothing is already imported or cached.
+PROBES = {
+    # modules app.py imports before it renders anything
+    "shell_imports": """
+import time
+t0 = time.perf_counter()
+import streamlit, query_log, startup
+print((time.perf_counter() - t0) * 1000)
+""",
+    # what the warmup thread does: heavy imports plus pickles and TF-IDF fit
+    "index_load": """
+import time
+t0 = time.perf_counter()
+from faq_index import FAQIndex
+FAQIndex("embeddings")
+print((time.perf_counter() - t0) * 1000)
+""",
+    # a full first script run of app.py, shell through sidebar
+    "first_run": """
+import logging, time
+logging.disable(logging.WARNING)
+from streamlit.testing.v1 import AppTest
+t0 = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=120).run()
+assert not at.exception, at.exception
+print((time.perf_counter() - t0) * 1000)
+""",
+}
+
+
+def run_probe(code):
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the chatbot")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--probe", choices=sorted(PROBES), action="append",
+                        help="run only these probes (default: all)")
+    parser.add_argument("--json", action="store_true", help="print one JSON object instead of a table")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.probe or PROBES:
+        samples = [run_probe(PROBES[name]) for _ in range(args.repeat)]
+        results[name] = {
+            "median_ms": round(statistics.median(samples), 1),
+            "min_ms": round(min(samples), 1),
+            "max_ms": round(max(samples), 1),
+        }
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{'probe':<15}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<15}{r['median_ms']:>12}{r['min_ms']:>10}{r['max_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from faq_index import DEFAULT_THRESHOLD, THRESHOLDS_FILE, FAQIndex
+
+THRESHOLD_GRID = np.round(np.arange(0.05, 0.96, 0.01), 2)
+MARGIN_GRID = np.round(np.arange(0.0, 0.21, 0.01), 2)
+
+
+# ----------------------------- LABELLED DATA -----------------------------
+def load_labelled(path):
+    """Read ``query|intent`` lines (header optional); an empty intent or ``none`` means out of scope"""
+    queries, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            line = line.strip()
+            if not line or (n == 0 and line.lower().startswith("query|")):
+                continue
+            query, _, intent = line.partition("|")
+            intent = intent.split("|")[0].strip()
+            queries.append(query.strip())
+            labels.append(None if intent.lower() in ("", "none") else intent)
+    return queries, labels
+
+
+# ----------------------------- SCORING -----------------------------
+def score_queries(index, queries, labels):
+    """Top-1 row, top-1 score, runner-up score and correctness for every query.
+
+    All queries are scored with one batched similarity matrix; the runner-up
+    is the best row of a different intent, matching FAQIndex.runner_up.
+    """
+    sims = index.similarities(queries)
+    rows = np.arange(len(queries))
+    best = sims.argmax(axis=1)
+    top1 = sims[rows, best]
+    same_intent = index.intent_ids[None, :] == index.intent_ids[best][:, None]
+    top2 = np.where(same_intent, -np.inf, sims).max(axis=1)
+    top2 = np.where(np.isfinite(top2), top2, 0.0)
+
+    predicted = np.array(index.intents, dtype=object)[best]
+    correct = np.array([p == l for p, l in zip(predicted, labels)])
+    return best, top1, top2, correct
+
+
+def costs(answered, correct, fallback_cost):
+    """Cost of each candidate setting; ``answered`` is (..., queries).
+
+    A wrong answer costs 1, abstaining when the top match was right costs
+    ``fallback_cost``. Abstaining on a wrong top match is free.
+    """
+    false_answers = (answered & ~correct).sum(axis=-1)
+    needless = (~answered & correct).sum(axis=-1)
+    return false_answers + fallback_cost * needless
+
+
+def pick(grid, cost):
+    """Middle of the lowest-cost plateau, so ties don't sit on a boundary"""
+    best = np.flatnonzero(cost == cost.min())
+    return float(grid[best[len(best) // 2]])
+
+
+def calibrate(index, queries, labels, fallback_cost=0.5, min_support=5):
+    best, top1, top2, correct = score_queries(index, queries, labels)
+    gap = top1 - top2
+
+    # global threshold x margin, vectorised over (thresholds, margins, queries)
+    answered = ((top1[None, None, :] >= THRESHOLD_GRID[:, None, None])
+                & (gap[None, None, :] >= MARGIN_GRID[None, :, None]))
+    grid_cost = costs(answered, correct, fallback_cost)
+    default = pick(THRESHOLD_GRID, grid_cost.min(axis=1))
+    margin = pick(MARGIN_GRID, grid_cost[np.flatnonzero(THRESHOLD_GRID == default)[0]])
+    margin_ok = gap >= margin
+
+    def per_group(keys):
+        keys = np.array(keys, dtype=object)[best]
+        out = {}
+        for key in np.unique(keys):
+            mask = keys == key
+            if mask.sum() < min_support:
+                continue
+            answered = (top1[mask][None, :] >= THRESHOLD_GRID[:, None]) & margin_ok[mask][None, :]
+            out[str(key)] = pick(THRESHOLD_GRID, costs(answered, correct[mask], fallback_cost))
+        return out
+
+    return {
+        "default": default,
+        "margin": margin,
+        "category": per_group(index.categories),
+        "intent": per_group(index.intents),
+    }
+
+
+def evaluate(index, queries, labels, cfg):
+    """False answers and needless fallbacks for a thresholds config"""
+    best, top1, top2, correct = score_queries(index, queries, labels)
+    default = cfg.get("default", DEFAULT_THRESHOLD)
+    limits = np.array([
+        cfg.get("intent", {}).get(index.intents[r],
+                                  cfg.get("category", {}).get(index.categories[r], default))
+        for r in best
+    ])
+    answered = (top1 >= limits) & (top1 - top2 >= cfg.get("margin", 0.0))
+    return {
+        "false_answers": int((answered & ~correct).sum()),
+        "needless_fallbacks": int((~answered & correct).sum()),
+    }
+
+
+def check_followups(index, queries, labels, weight=0.5):
+    """Out-of-scope queries that are answered only because of a previous turn's match.
+
+    Every out-of-scope query is asked as a follow-up to every row the
+    in-scope queries are answered with. Context may re-rank what a
+    follow-up matches but should never turn a fallback into an answer, so
+    the list should be empty.
+    """
+    contexts = set()
+    for q, label in zip(queries, labels):
+        row, _, accepted = index.match(q)
+        if accepted and label is not None:
+            contexts.add(row)
+    checked, answered = 0, []
+    for q, label in zip(queries, labels):
+        if label is not None or index.match(q)[2]:
+            continue
+        for prev in sorted(contexts):
+            checked += 1
+            row, _, accepted = index.match(q, (prev, weight))
+            if accepted:
+                answered.append((q, prev, row))
+    return checked, answered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate answer thresholds on a labelled query set")
+    parser.add_argument("labelled", help="file of query|intent lines")
+    parser.add_argument("--data", default="embeddings")
+    parser.add_argument("--fallback-cost", type=float, default=0.5,
+                        help="cost of a needless fallback relative to a wrong answer")
+    parser.add_argument("--min-support", type=int, default=5,
+                        help="queries needed before a category/intent gets its own threshold")
+    parser.add_argument("--dry-run", action="store_true", help="print the result without writing it")
+    parser.add_argument("--encoder", help="query encoder used at runtime: 'stub' or a model directory")
+    parser.add_argument("--dense-weight", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.encoder == "stub" and not args.dry_run:
+        # the app refuses the stub, so thresholds fitted to its scores would never apply
+        parser.error("--encoder stub is only for trying the pipeline; use it with --dry-run")
+    encoder = None
+    if args.encoder:
+        from query_encoder import load_encoder
+        encoder = load_encoder(args.encoder)
+    index = FAQIndex(args.data, encoder, args.dense_weight)
+    queries, labels = load_labelled(args.labelled)
+    if not queries:
+        parser.error(f"no labelled queries in {args.labelled}")
+
+    cfg = calibrate(index, queries, labels, args.fallback_cost, args.min_support)
+    # thresholds only hold for the scores they were fitted on; FAQIndex ignores
+    # the file when it runs with another encoder or dense weight
+    cfg["encoder"], cfg["dense_weight"] = index.scoring_setup()
+    before = evaluate(index, queries, labels, {})
+    after = evaluate(index, queries, labels, cfg)
+    print(f"{len(queries)} queries")
+    print(f"before: {before['false_answers']} false answers, {before['needless_fallbacks']} needless fallbacks")
+    print(f"after:  {after['false_answers']} false answers, {after['needless_fallbacks']} needless fallbacks")
+    print(f"default {cfg['default']:.2f}, margin {cfg['margin']:.2f}, "
+          f"{len(cfg['category'])} category and {len(cfg['intent'])} intent thresholds")
+
+    index.load_thresholds(cfg)
+    checked, answered = check_followups(index, queries, labels)
+    print(f"off-topic follow-ups answered from context: {len(answered)} of {checked}")
+    for q, prev, row in answered:
+        print(f"    {q} (after {index.questions[prev]}) -> {index.questions[row]}")
+    if answered:
+        # a regression in FAQIndex's context path, not something thresholds should paper over
+        parser.exit(1, f"error: context turned {len(answered)} fallbacks into answers; "
+                       f"{THRESHOLDS_FILE} not written\n")
+
+    if not args.dry_run:
+        out = Path(args.data) / THRESHOLDS_FILE
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(cfg, f, indent=2, sort_keys=True)
+        print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
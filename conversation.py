@@ -0,0 +1,113 @@
+import time
+
+MANUAL = {
+    "hello": "👋 Hello! Welcome to UET Taxila AI Assistant. How can I help you today?",
+    "hi": "👋 Hi there! Feel free to ask anything about UET Taxila.",
+    "how are you": "🤖 I'm functioning perfectly and ready to assist you anytime!",
+    "thanks": "😊 You're welcome! Feel free to ask more questions.",
+    "thank you": "😊 Happy to help! Let me know if you need anything else.",
+}
+REPEAT_REPLY = "⚠️ You already asked this question. Please check the chat history below."
+MISS_REPLY = ("❌ Sorry, I don't have an answer for that specific question. Please try rephrasing "
+              "or ask about admissions, programs, scholarships, hostels, or fee structure.")
+
+# Weight of the previous match when blending it into a follow-up question,
+# and how fast it fades on turns that don't produce a new match
+CONTEXT_WEIGHT = 0.5
+CONTEXT_DECAY = 0.5
+CONTEXT_MIN_WEIGHT = 0.1
+
+
+# ----------------------------- SESSION STATE -----------------------------
+class SessionState:
+    """The per-session fields the answer path reads and writes.
+
+    app.py passes ``st.session_state``, which has the same attributes;
+    callers outside Streamlit (load_test.py) use this instead.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.history = []
+        self.context = None
+        self.related = []
+        self.suggestions = []
+
+
+# ----------------------------- ANSWER PATH -----------------------------
+def get_answer(q, state, registry, query_log, kb=None):
+    """Answer ``q`` for one session: match, log the outcome, refresh related answers and suggestions.
+
+    ``kb`` is the ``?kb=`` URL parameter: a knowledge base name pins it,
+    ``all`` searches every one, and None routes by predicted category.
+    The caller appends the turn to ``state.history``.
+    """
+    t0 = time.perf_counter()
+    reply, kind, shard, row, score = match_query(q, state, registry, kb)
+    query_log.record(
+        q, kind, shard=shard, row=row, score=score,
+        latency_ms=(time.perf_counter() - t0) * 1000,
+        session_id=state.session_id,
+    )
+    state.related = related_answers(q, registry, shard, row if kind == "faq" else None)
+    state.suggestions = (
+        [registry.get(shard).questions[r] for r in registry.get(shard).related.neighbours(row, 4)]
+        if kind == "faq" else []
+    )
+    return reply
+
+
+def related_answers(q, registry, shard, row, k=3):
+    """Answers whose own text matches q, other than the one already shown"""
+    if shard is None:
+        return []
+    kb_index = registry.get(shard)
+    hits = kb_index.answer_index.search(q, k + 1)
+    return [(kb_index.questions[r], kb_index.answers[r]) for r, _ in hits if r != row][:k]
+
+
+def match_query(q, state, registry, kb=None):
+    """Return (reply, kind, shard, row, score) where kind is manual/repeat/faq/miss"""
+    q_low = q.lower().strip()
+
+    for k, v in MANUAL.items():
+        if k in q_low:
+            return v, "manual", None, None, None
+
+    previous = [x[1].lower().strip() for x in state.history if x[0] == "You"]
+    if q_low in previous:
+        return REPEAT_REPLY, "repeat", None, None, None
+
+    shard, best, score, accepted = find_match(q, state, registry, kb)
+    update_context(state, shard, best if accepted else None)
+
+    if not accepted:
+        return MISS_REPLY, "miss", shard, best, score
+
+    return registry.get(shard).answers[best], "faq", shard, best, score
+
+
+def find_match(q, state, registry, kb=None):
+    """Pick the knowledge base for q and match it there; returns (shard, row, score, accepted)"""
+    if kb == "all":
+        score, shard, row = registry.search(q, k=1)[0]
+        return shard, row, score, bool(score >= registry.get(shard).row_thresholds[row])
+
+    shard = registry.route(kb) if kb else registry.route(query=q)
+    context = state.context
+    if context is not None and context[0] == shard:
+        context = context[1:]
+    else:
+        context = None
+    row, score, accepted = registry.get(shard).match(q, context)
+    return shard, row, score, accepted
+
+
+def update_context(state, shard, row):
+    """Carry the matched row into the next turn, or fade the old one after a miss"""
+    if row is not None:
+        state.context = (shard, row, CONTEXT_WEIGHT)
+    elif state.context is not None:
+        shard, prev, weight = state.context
+        weight *= CONTEXT_DECAY
+        state.context = (shard, prev, weight) if weight >= CONTEXT_MIN_WEIGHT else None
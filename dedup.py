@@ -0,0 +1,272 @@
+import argparse
+import re
+import zlib
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+DATASET = Path("faq_dataset.txt")
+MERSENNE = (1 << 61) - 1
+
+
+# ----------------------------- DATASET -----------------------------
+def read_dataset(path=DATASET):
+    """Rows of faq_dataset.txt as (question, answer, intent, category) tuples"""
+    with open(path, encoding="utf-8") as f:
+        lines = [line.rstrip("\n") for line in f]
+    rows = []
+    for line in lines[1:]:
+        if line.strip():
+            question, answer, intent, category = line.split("|")[:4]
+            rows.append((question, answer, intent, category))
+    return lines[0], rows
+
+
+def normalize_text(text):
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def shingles(text):
+    """Word unigrams and bigrams: questions are too short for longer shingles"""
+    words = normalize_text(text).split()
+    grams = set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+    return {zlib.crc32(g.encode("utf-8")) for g in grams}
+
+
+# ----------------------------- UNION-FIND -----------------------------
+class DisjointSet:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def groups(self):
+        out = defaultdict(list)
+        for x in range(len(self.parent)):
+            out[self.find(x)].append(x)
+        return [g for g in out.values() if len(g) > 1]
+
+
+# ----------------------------- LSH -----------------------------
+def minhash_signatures(texts, num_perm=64, seed=0):
+    """(rows, num_perm) MinHash signatures of the question shingles"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE, num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE, num_perm, dtype=np.uint64)
+    sigs = np.full((len(texts), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i, text in enumerate(texts):
+        hashed = np.fromiter(shingles(text), dtype=np.uint64)
+        if len(hashed):
+            # (a * x + b) mod p; uint64 wraparound is fine for hashing purposes
+            sigs[i] = ((hashed[:, None] * a + b) % MERSENNE).min(axis=0)
+    return sigs
+
+
+def simhash_bits(embeddings, n_bits, seed=0):
+    """Random-hyperplane sign bits: rows close in cosine agree on most bits"""
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((embeddings.shape[1], n_bits)).astype(np.float32)
+    return (np.asarray(embeddings, dtype=np.float32) @ planes) > 0
+
+
+def banded_candidates(signatures, bands, max_bucket=64):
+    """Row pairs that collide in at least one band.
+
+    Each row lands in ``bands`` buckets, so the work is linear in the number
+    of rows plus the pairs inside each bucket; buckets bigger than
+    ``max_bucket`` are linked as a chain instead of all pairs.
+    """
+    rows_per_band = signatures.shape[1] // bands
+    pairs = set()
+    for band in range(bands):
+        chunk = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        buckets = defaultdict(list)
+        for i, key in enumerate(map(bytes, np.ascontiguousarray(chunk))):
+            buckets[key].append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) > max_bucket:
+                pairs.update(zip(members, members[1:]))
+            else:
+                pairs.update((x, y) for n, x in enumerate(members) for y in members[n + 1:])
+    return pairs
+
+
+def pair_array(pairs):
+    return np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+
+
+def chunked(pairs, score, chunk=65536):
+    """Score candidate pairs with numpy, ``chunk`` pairs at a time"""
+    out = np.empty(len(pairs), dtype=np.float32)
+    for start in range(0, len(pairs), chunk):
+        block = pairs[start:start + chunk]
+        out[start:start + chunk] = score(block[:, 0], block[:, 1])
+    return out
+
+
+# ----------------------------- DUPLICATE DETECTION -----------------------------
+def find_duplicates(rows, embeddings=None, jaccard=0.7, cosine=0.92, num_perm=64, bands=16,
+                    dense_bits=128, dense_bands=16):
+    """Group exact and near-duplicate questions.
+
+    Exact: identical after lowercasing and stripping punctuation.
+    Near: a MinHash-LSH candidate whose estimated Jaccard similarity is
+    >= ``jaccard``, or (with ``embeddings`` aligned to ``rows``) a SimHash
+    candidate whose dense cosine is >= ``cosine``. Both candidate
+    generators are banded hashes, so nothing compares all pairs.
+    """
+    questions = [r[0] for r in rows]
+    exact = DisjointSet(len(rows))
+    first = {}
+    for i, q in enumerate(questions):
+        key = normalize_text(q)
+        if key in first:
+            exact.union(first[key], i)
+        else:
+            first[key] = i
+
+    near = DisjointSet(len(rows))
+    evidence = {}
+    sigs = minhash_signatures(questions, num_perm)
+    pairs = pair_array(banded_candidates(sigs, bands))
+    scores = chunked(pairs, lambda x, y: (sigs[x] == sigs[y]).mean(axis=1))
+    for (x, y), score in zip(pairs[scores >= jaccard].tolist(), scores[scores >= jaccard].tolist()):
+        near.union(x, y)
+        evidence[(x, y)] = f"jaccard {score:.2f}"
+    if embeddings is not None:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        pairs = pair_array(banded_candidates(simhash_bits(embeddings, dense_bits), dense_bands))
+        scores = chunked(pairs, lambda x, y: np.einsum("ij,ij->i", embeddings[x], embeddings[y]))
+        for (x, y), score in zip(pairs[scores >= cosine].tolist(), scores[scores >= cosine].tolist()):
+            near.union(x, y)
+            evidence.setdefault((x, y), f"cosine {score:.2f}")
+
+    exact_groups = exact.groups()
+    exact_rows = {r for g in exact_groups for r in g}
+    near_groups = [g for g in near.groups() if not set(g) <= exact_rows]
+    by_group = defaultdict(set)
+    for (x, _), e in evidence.items():
+        by_group[near.find(x)].add(e)
+
+    def describe(kind, group):
+        answers = {normalize_text(rows[r][1]) for r in group}
+        return {
+            "kind": kind,
+            "rows": group,
+            "conflicting": len(answers) > 1,
+            "evidence": sorted(by_group[near.find(group[0])]) if kind == "near" else [],
+        }
+
+    return [describe("exact", g) for g in exact_groups] + [describe("near", g) for g in near_groups]
+
+
+def merge(rows, groups):
+    """Fold overlapping groups together into their first row; the other questions become its aliases.
+
+    Returns the merged rows and the folded rows whose answer or intent
+    differs from their canonical row's, as (canonical row, folded row)
+    pairs, so nothing is lost without a trace.
+    """
+    combined = DisjointSet(len(rows))
+    for group in groups:
+        for r in group[1:]:
+            combined.union(group[0], r)
+    aliases = defaultdict(list)
+    dropped = set()
+    differing = []
+    for canonical, *rest in combined.groups():
+        for r in rest:
+            dropped.add(r)
+            if normalize_text(rows[r][0]) != normalize_text(rows[canonical][0]):
+                aliases[canonical].append(rows[r][0])
+            if (normalize_text(rows[r][1]) != normalize_text(rows[canonical][1])
+                    or rows[r][2] != rows[canonical][2]):
+                differing.append((canonical, r))
+    merged = [(*row, aliases[i]) for i, row in enumerate(rows) if i not in dropped]
+    return merged, differing
+
+
+def load_aligned_embeddings(data_path, rows):
+    """faq_embeddings.npy if its rows are the dataset's rows, in order; otherwise None"""
+    import pickle
+
+    data_path = Path(data_path)
+    try:
+        with open(data_path / "faq_questions.pkl", "rb") as f:
+            questions = pickle.load(f)
+        embeddings = np.load(data_path / "faq_embeddings.npy", mmap_mode="r")
+    except FileNotFoundError:
+        return None
+    if len(questions) != len(rows) or any(q != r[0] for q, r in zip(questions, rows)):
+        return None
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicate and near-duplicate FAQ rows")
+    parser.add_argument("--dataset", default=str(DATASET))
+    parser.add_argument("--data", default="embeddings",
+                        help="index directory; its embeddings are used when they match the dataset")
+    parser.add_argument("--jaccard", type=float, default=0.7)
+    parser.add_argument("--cosine", type=float, default=0.92)
+    parser.add_argument("--conflicts-only", action="store_true",
+                        help="only report groups whose answers disagree")
+    parser.add_argument("--merge", metavar="OUT",
+                        help="write a deduplicated dataset with an extra 'aliases' column (';'-separated); "
+                             "groups with conflicting answers are left as they are")
+    parser.add_argument("--merge-conflicting", action="store_true",
+                        help="with --merge, fold conflicting groups too; the answers and intents this "
+                             "drops are written to OUT.review.txt")
+    args = parser.parse_args()
+
+    header, rows = read_dataset(args.dataset)
+    embeddings = load_aligned_embeddings(args.data, rows)
+    if embeddings is None:
+        print("note: embeddings don't match the dataset rows; using MinHash only")
+    groups = find_duplicates(rows, embeddings, jaccard=args.jaccard, cosine=args.cosine)
+
+    shown = [g for g in groups if g["conflicting"] or not args.conflicts_only]
+    for g in shown:
+        flag = "  CONFLICTING ANSWERS" if g["conflicting"] else ""
+        evidence = f" ({', '.join(g['evidence'])})" if g["evidence"] else ""
+        print(f"{g['kind'].upper()} rows {', '.join(str(r + 2) for r in g['rows'])}{evidence}{flag}")
+        for r in g["rows"]:
+            print(f"    [{rows[r][2]}] {rows[r][0]} -> {rows[r][1]}")
+    n_exact = sum(g["kind"] == "exact" for g in groups)
+    n_conflict = sum(g["conflicting"] for g in groups)
+    print(f"{n_exact} exact and {len(groups) - n_exact} near-duplicate groups, {n_conflict} with conflicting answers")
+
+    if args.merge:
+        mergeable = [g["rows"] for g in groups if args.merge_conflicting or not g["conflicting"]]
+        merged, differing = merge(rows, mergeable)
+        with open(args.merge, "w", encoding="utf-8") as f:
+            f.write(header + "|aliases\n")
+            for question, answer, intent, category, aliases in merged:
+                f.write("|".join([question, answer, intent, category, ";".join(aliases)]) + "\n")
+        print(f"{len(rows)} rows -> {len(merged)} rows in {args.merge}")
+        skipped = len(groups) - len(mergeable)
+        if skipped:
+            print(f"{skipped} conflicting groups left unmerged; review them, or pass --merge-conflicting")
+        if differing:
+            review = f"{args.merge}.review.txt"
+            with open(review, "w", encoding="utf-8") as f:
+                for canonical, r in differing:
+                    f.write(f"row {canonical + 2} kept [{rows[canonical][2]}] {rows[canonical][1]}\n")
+                    f.write(f"    row {r + 2} dropped [{rows[r][2]}] {rows[r][0]} -> {rows[r][1]}\n")
+            print(f"{len(differing)} dropped answers/intents written to {review}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import pickle
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+DATA_PATH = Path("embeddings")
+THRESHOLDS_FILE = "faq_thresholds.json"
+DEFAULT_THRESHOLD = 0.35
+
+
+def texts_checksum(texts):
+    """Digest of a text column, stored with derived files to tell when they are stale"""
+    h = hashlib.blake2b(digest_size=16)
+    for text in texts:
+        h.update(text.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+# ----------------------------- FAQ INDEX -----------------------------
+class FAQIndex:
+    """The FAQ rows from ``embeddings/`` plus the TF-IDF model fitted on their questions.
+
+    With a query ``encoder`` (see query_encoder.py) scores become
+    ``(1 - dense_weight) * tfidf_cosine + dense_weight * dense_cosine``
+    against faq_embeddings.npy; the encoder is checked against the stored
+    matrix (shape, normalisation and a re-encoded sample of the questions)
+    before the index is usable.
+    """
+
+    def __init__(self, data_path=DATA_PATH, encoder=None, dense_weight=0.5):
+        self.data_path = Path(data_path)
+        self.answers = self._load("faq_answers.pkl")
+        self.questions = self._load("faq_questions.pkl")
+        self.intents = self._load("faq_intents.pkl")
+        self.categories = self._load("faq_categories.pkl")
+
+        self.vectorizer = TfidfVectorizer().fit(self.questions)
+        self.q_vecs = self.vectorizer.transform(self.questions)
+        self._embeddings = None
+        self._answer_index = None
+        self._related = None
+
+        self.encoder = encoder
+        self.dense_weight = dense_weight if encoder is not None else 0.0
+        self._dense = None
+        if encoder is not None:
+            from query_encoder import check_compatible
+            check_compatible(encoder, self.embeddings, self.questions)
+            self._dense = np.asarray(self.embeddings, dtype=np.float32)
+
+        self.intent_ids = np.unique(self.intents, return_inverse=True)[1]
+        self.category_ids = np.unique(self.categories, return_inverse=True)[1]
+        self.category_rows = [np.flatnonzero(self.category_ids == c)
+                              for c in range(self.category_ids.max() + 1)]
+        self.load_thresholds()
+
+    def load_thresholds(self, cfg=None):
+        """Resolve the calibrated cutoff for every row: intent, then category, then default.
+
+        Uses ``cfg`` if given, else faq_thresholds.json (written by calibrate.py)
+        when it was calibrated for this index's scoring_setup(); otherwise
+        every row uses DEFAULT_THRESHOLD, no abstain margin and no context slack.
+        """
+        path = self.data_path / THRESHOLDS_FILE
+        if cfg is None and path.exists():
+            with open(path, encoding="utf-8") as f:
+                cfg = json.load(f)
+            encoder, dense_weight = self.scoring_setup()
+            if cfg.get("encoder") != encoder or abs(cfg.get("dense_weight", 0.0) - dense_weight) > 1e-6:
+                warnings.warn(
+                    f"ignoring {path}: calibrated for encoder {cfg.get('encoder')!r} with dense_weight "
+                    f"{cfg.get('dense_weight', 0.0)}, but this index uses {encoder!r} with {dense_weight}"
+                )
+                cfg = {}
+        cfg = cfg or {}
+        default = cfg.get("default", DEFAULT_THRESHOLD)
+        by_intent = cfg.get("intent", {})
+        by_category = cfg.get("category", {})
+        self.row_thresholds = np.array([
+            by_intent.get(i, by_category.get(c, default))
+            for i, c in zip(self.intents, self.categories)
+        ], dtype=np.float32)
+        self.margin = cfg.get("margin", 0.0)
+        self.context_slack = cfg.get("context_slack", 0.0)
+
+    def scoring_setup(self):
+        """(encoder name, dense weight): scores, and so thresholds, are only comparable for the same pair"""
+        if self.encoder is None:
+            return None, 0.0
+        return getattr(self.encoder, "name", type(self.encoder).__name__), float(self.dense_weight)
+
+    def _load(self, name):
+        with open(self.data_path / name, "rb") as f:
+            return pickle.load(f)
+
+    def __len__(self):
+        return len(self.questions)
+
+    @property
+    def embeddings(self):
+        """Dense (rows, dim) document vectors from faq_embeddings.npy, loaded on first use"""
+        if self._embeddings is None:
+            self._embeddings = np.load(self.data_path / "faq_embeddings.npy", mmap_mode="r")
+        return self._embeddings
+
+    @property
+    def answer_index(self):
+        """Full-text index over the answers: faq_answer_index.npz if built from these answers, else built here"""
+        if self._answer_index is None:
+            from answer_search import ANSWER_INDEX_FILE, AnswerIndex
+            path = self.data_path / ANSWER_INDEX_FILE
+            checksum = texts_checksum(self.answers)
+            index = AnswerIndex.load(path) if path.exists() else None
+            if index is None or index.checksum != checksum:
+                index = AnswerIndex.build(self.answers, checksum)
+            self._answer_index = index
+        return self._answer_index
+
+    @property
+    def related(self):
+        """Related-questions graph: faq_related.npz if built from these questions, else built here"""
+        if self._related is None:
+            from related_graph import RELATED_FILE, RelatedGraph
+            path = self.data_path / RELATED_FILE
+            checksum = texts_checksum(self.questions)
+            graph = RelatedGraph.load(path) if path.exists() else None
+            if graph is None or graph.checksum != checksum:
+                graph = RelatedGraph.build(self.q_vecs, self.embeddings, checksum=checksum)
+            self._related = graph
+        return self._related
+
+    def nbytes(self):
+        """Rough resident size: TF-IDF matrix, dense vectors if loaded, and the text columns"""
+        size = self.q_vecs.data.nbytes + self.q_vecs.indices.nbytes + self.q_vecs.indptr.nbytes
+        if self._embeddings is not None:
+            size += self._embeddings.nbytes
+        if self._answer_index is not None:
+            size += self._answer_index.nbytes()
+        if self._related is not None:
+            size += self._related.nbytes()
+        for column in (self.answers, self.questions, self.intents, self.categories):
+            size += sum(sys.getsizeof(s) for s in column)
+        return size
+
+    def _encode(self, queries):
+        """TF-IDF vectors and, with an encoder, dense vectors for ``queries``"""
+        q_vecs = self.vectorizer.transform(queries)
+        dense = self.encoder.encode(queries) if self.encoder is not None else None
+        return q_vecs, dense
+
+    def _scores(self, q_vecs, dense):
+        sims = cosine_similarity(q_vecs, self.q_vecs)
+        if dense is None:
+            return sims
+        return (1 - self.dense_weight) * sims + self.dense_weight * (dense @ self._dense.T)
+
+    def similarities(self, queries):
+        """Similarity of each query against every FAQ question, shape (len(queries), rows)"""
+        return self._scores(*self._encode(queries))
+
+    def top_k(self, q, k=5):
+        """The ``k`` best rows for ``q`` as (row, score), best first"""
+        sims = self.similarities([q])[0]
+        k = min(k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(int(r), float(sims[r])) for r in top]
+
+    def runner_up(self, sims, best):
+        """Best score among rows whose intent differs from ``best``'s (paraphrases don't compete)"""
+        other = self.intent_ids != self.intent_ids[best]
+        return float(sims[other].max()) if other.any() else 0.0
+
+    def accept(self, sims, row, slack=0.0):
+        """Threshold (less ``slack``) and abstain-margin test for ``row`` under ``sims``"""
+        score = sims[row]
+        if score < self.row_thresholds[row] - slack:
+            return False
+        return bool(self.margin <= 0 or score - self.runner_up(sims, row) >= self.margin)
+
+    def match(self, q, context=None):
+        """Return (row, score, accepted) for the best-matching FAQ row.
+
+        ``context`` is ``(row, weight)`` for the previous turn's match. The
+        follow-up is then also scored as the query vector blended with that
+        row's vector, first within the previous row's category and then over
+        all rows. A blended hit wins only if the query on its own already
+        passes that row's threshold (less ``context_slack``) and abstain
+        margin, the blend passes both too, and it beats the query's plain
+        best score: context can re-rank what the query matches, not turn a
+        miss into a hit.
+        """
+        q_vec, dense = self._encode([q])
+        sims = self._scores(q_vec, dense)[0]
+        best = int(np.argmax(sims))
+        score = float(sims[best])
+        if context is not None:
+            hit = self._match_in_context(q_vec, dense, sims, score, *context)
+            if hit is not None:
+                return hit[0], hit[1], True
+        return best, score, self.accept(sims, best)
+
+    def _match_in_context(self, q_vec, dense, sims, score, prev, weight):
+        # cos(q + w*p, r) from the dot products already at hand: no second search.
+        # Query and rows are unit (or zero) vectors in each space, so ``sims`` are
+        # already dot products in the weighted TF-IDF + dense space.
+        t, d = 1 - self.dense_weight, self.dense_weight
+        prev_vec = self.q_vecs[prev]
+        prev_sims = t * (self.q_vecs @ prev_vec.T).toarray().ravel()
+        q_norm_sq = t * q_vec.multiply(q_vec).sum()
+        overlap = t * (q_vec @ prev_vec.T).toarray()[0, 0]
+        if dense is not None:
+            prev_dense = self._dense[prev]
+            prev_sims += d * (self._dense @ prev_dense)
+            q_norm_sq += d * float(dense[0] @ dense[0])
+            overlap += d * float(dense[0] @ prev_dense)
+        norm = np.sqrt(q_norm_sq + weight ** 2 + 2 * weight * overlap)
+        blended = (sims + weight * prev_sims) / norm
+        # a follow-up asks for something other than the answer it follows
+        blended[prev] = -1.0
+
+        for rows in (self.category_rows[self.category_ids[prev]], None):
+            cand = int(np.argmax(blended)) if rows is None else int(rows[np.argmax(blended[rows])])
+            if (self.accept(sims, cand, self.context_slack) and blended[cand] >= score
+                    and self.accept(blended, cand)):
+                return cand, float(blended[cand])
+        return None
@@ -0,0 +1,188 @@
+import argparse
+import heapq
+from pathlib import Path
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from faq_index import FAQIndex
+from query_log import DEFAULT_DB, iter_unanswered
+
+
+# ----------------------------- QUERY EMBEDDING -----------------------------
+class GapEmbedder:
+    """Map raw queries into a fixed-size dense space for clustering.
+
+    The first part is the query projected onto the FAQ embedding space: the
+    TF-IDF similarities to every FAQ question weight the rows of
+    faq_embeddings.npy, so a query lands near the FAQ vectors it shares words
+    with. Queries with no vocabulary overlap project to zero, so a small
+    hashed bag-of-words part is appended to keep them separable. Nothing is
+    fitted on the log, which keeps every chunk independent.
+
+    With a query ``encoder`` the dense part is the encoded query itself.
+    """
+
+    def __init__(self, index, hash_features=1024, lexical_weight=0.5, encoder=None):
+        self.index = index
+        self.encoder = encoder
+        self.embeddings = np.asarray(index.embeddings, dtype=np.float32)
+        self.lexical_weight = lexical_weight
+        self.hasher = HashingVectorizer(
+            n_features=hash_features, alternate_sign=False, norm="l2"
+        )
+
+    @property
+    def dense_dim(self):
+        return self.embeddings.shape[1]
+
+    def transform(self, queries):
+        if self.encoder is not None:
+            dense = self.encoder.encode(queries)
+        else:
+            sims = self.index.similarities(queries).astype(np.float32)
+            dense = normalize(sims @ self.embeddings)
+        lexical = self.hasher.transform(queries).toarray().astype(np.float32)
+        return np.hstack([dense, self.lexical_weight * lexical])
+
+
+# ----------------------------- STREAMING CLUSTERING -----------------------------
+def iter_chunks(source, chunk_size):
+    """Yield lists of queries from a query-log database or a one-query-per-line text file"""
+    source = Path(source)
+    if source.suffix == ".db":
+        yield from iter_unanswered(source, chunk_size)
+        return
+    with open(source, encoding="utf-8") as f:
+        chunk = []
+        for line in f:
+            line = line.strip()
+            if line:
+                chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def mine_gaps(source, index, n_clusters=30, chunk_size=4096, new_intent_threshold=0.75,
+              examples=5, seed=0, encoder=None):
+    """Cluster below-threshold queries and map each cluster onto the FAQ.
+
+    Two streaming passes over ``source``: the first fits mini-batch k-means
+    chunk by chunk, the second assigns every query to a cluster and keeps
+    counts plus the few queries closest to each centroid. Memory is bounded
+    by ``chunk_size`` and ``n_clusters``, not by the size of the log.
+    """
+    embedder = GapEmbedder(index, encoder=encoder)
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=seed, n_init=3)
+
+    pending = []
+    fitted = False
+    for chunk in iter_chunks(source, chunk_size):
+        pending.extend(chunk)
+        # partial_fit needs at least n_clusters samples in its first batch
+        if len(pending) >= n_clusters:
+            kmeans.partial_fit(embedder.transform(pending))
+            fitted = True
+            pending = []
+    if pending and fitted:
+        kmeans.partial_fit(embedder.transform(pending))
+    elif pending:
+        distinct = len(set(pending))
+        if distinct < 2:
+            return []
+        kmeans.set_params(n_clusters=min(n_clusters, distinct))
+        kmeans.partial_fit(embedder.transform(pending))
+    elif not fitted:
+        return []
+
+    k = kmeans.n_clusters
+    counts = np.zeros(k, dtype=np.int64)
+    nearest = [[] for _ in range(k)]
+    for chunk in iter_chunks(source, chunk_size):
+        X = embedder.transform(chunk)
+        labels = kmeans.predict(X)
+        dists = np.linalg.norm(X - kmeans.cluster_centers_[labels], axis=1)
+        counts += np.bincount(labels, minlength=k)
+        for q, label, dist in zip(chunk, labels, dists):
+            # max-heap on distance via negation, capped at ``examples`` distinct queries
+            heap = nearest[label]
+            if any(q == item[1] for item in heap):
+                continue
+            if len(heap) < examples:
+                heapq.heappush(heap, (-dist, q))
+            elif -heap[0][0] > dist:
+                heapq.heapreplace(heap, (-dist, q))
+
+    centroids = normalize(kmeans.cluster_centers_[:, :embedder.dense_dim])
+    faq_sims = centroids @ embedder.embeddings.T
+
+    report = []
+    for c in np.argsort(-counts):
+        if counts[c] == 0:
+            continue
+        row = int(np.argmax(faq_sims[c]))
+        score = float(faq_sims[c, row])
+        report.append({
+            "cluster": int(c),
+            "count": int(counts[c]),
+            "examples": [q for _, q in sorted(nearest[c], reverse=True)],
+            "nearest_row": row,
+            "nearest_question": index.questions[row],
+            "intent": index.intents[row],
+            "category": index.categories[row],
+            "score": score,
+            "new_intent": score < new_intent_threshold,
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster unanswered queries into FAQ gaps")
+    parser.add_argument("--source", default=str(DEFAULT_DB),
+                        help="query log database (.db) or text file with one query per line")
+    parser.add_argument("--data", default="embeddings")
+    parser.add_argument("--clusters", type=int, default=30)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--new-intent-threshold", type=float, default=0.75)
+    parser.add_argument("--examples", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--encoder", help="embed queries with this encoder (a model directory) "
+                                          "instead of projecting them through TF-IDF")
+    args = parser.parse_args()
+
+    if not Path(args.source).exists():
+        parser.error(f"no such source: {args.source}")
+
+    if args.encoder == "stub":
+        # its vectors aren't in the faq_embeddings.npy space, so "nearest intent" would be noise
+        parser.error("--encoder stub can't be compared with faq_embeddings.npy; "
+                     "pass the model the embeddings were built with, or no encoder")
+    encoder = None
+    if args.encoder:
+        from query_encoder import load_encoder
+        encoder = load_encoder(args.encoder)
+    report = mine_gaps(
+        args.source, FAQIndex(args.data, encoder), n_clusters=args.clusters,
+        chunk_size=args.chunk_size, new_intent_threshold=args.new_intent_threshold,
+        examples=args.examples, seed=args.seed, encoder=encoder,
+    )
+    if not report:
+        print("Not enough unanswered queries to cluster.")
+        return
+    for r in report:
+        if r["new_intent"]:
+            target = "NEW INTENT"
+        else:
+            target = f"{r['intent']} / {r['category']}"
+        print(f"[{r['count']}] {target}  (nearest: \"{r['nearest_question']}\", {r['score']:.2f})")
+        for q in r["examples"]:
+            print(f"    - {q}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from conversation import SessionState, get_answer
+
+ROOT = Path(__file__).resolve().parent
+DATASET = ROOT / "faq_dataset.txt"
+
+FOLLOW_UPS = ["what about for girls?", "and the fee?", "is it the same for masters?",
+              "what about international students?", "and the deadline?"]
+OFF_TOPIC = ["who won the cricket match yesterday", "best biryani near taxila",
+             "how do I reset my phone", "what is the weather today", "recommend a movie"]
+
+
+# ----------------------------- QUERY MIX -----------------------------
+class QueryMix:
+    """Reproducible stream of student questions drawn from faq_dataset.txt.
+
+    Mostly paraphrases (words dropped and reordered) of dataset questions,
+    plus exact questions, short follow-ups and off-topic noise, so the run
+    exercises hits, misses and the context path.
+    """
+
+    def __init__(self, seed, path=DATASET):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        with open(path, encoding="utf-8") as f:
+            rows = [line.rstrip("\n").split("|") for line in f][1:]
+        self.questions = [r[0] for r in rows if r and r[0]]
+        self.categories = sorted({r[3] for r in rows if len(r) > 3})
+
+    def question(self):
+        roll = self.rng.random()
+        if roll < 0.10:
+            return self.rng.choice(OFF_TOPIC)
+        if roll < 0.25:
+            return self.rng.choice(FOLLOW_UPS)
+        q = self.rng.choice(self.questions)
+        if roll < 0.50:
+            return q
+        words = q.rstrip("?").split()
+        keep = max(2, len(words) - self.rng.randint(1, 3))
+        return " ".join(self.rng.sample(words, len(words))[:keep]) + "?"
+
+    def action(self):
+        """Next UI action a student takes, weighted towards asking questions"""
+        return self.rng.choices(
+            ["typed", "sample", "category", "load_more"], weights=[6, 2, 1, 1]
+        )[0]
+
+
+# ----------------------------- SESSIONS -----------------------------
+class InProcessSession:
+    """The answer path of app.py without Streamlit.
+
+    ``ask`` calls conversation.get_answer, the function app.py answers
+    with, on a plain SessionState. Category changes and "Load More" do the
+    sidebar filtering and history paging they trigger in the app.
+    """
+
+    def __init__(self, registry, query_log, mix, kb=None):
+        self.registry = registry
+        self.query_log = query_log
+        self.mix = mix
+        self.kb = kb
+        self.state = SessionState(f"load-test-{mix.seed}")
+        self.visible_questions = []
+        self.history_count = 10
+
+    def ask(self, q):
+        reply = get_answer(q, self.state, self.registry, self.query_log, self.kb)
+        self.state.history.append(("You", q))
+        self.state.history.append(("Bot", reply))
+
+    def step(self, action):
+        if action == "sample":
+            self.ask(self.mix.rng.choice(self.mix.questions))
+        elif action == "category":
+            selected = self.mix.rng.choice(["All"] + self.mix.categories)
+            categories = self.registry.get().categories
+            self.visible_questions = [i for i, c in enumerate(categories) if selected in ("All", c)][:5]
+        elif action == "load_more":
+            self.history_count += 10
+            self.visible_history = self.state.history[-self.history_count:]
+        else:
+            self.ask(self.mix.question())
+        return action
+
+
+class AppSession:
+    """One simulated browser session driving app.py through Streamlit's AppTest."""
+
+    def __init__(self, mix, timeout, kb=None):
+        from streamlit.testing.v1 import AppTest
+
+        self.mix = mix
+        self.at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=timeout)
+        if kb:
+            self.at.query_params["kb"] = kb
+        self.at.run()
+        self._check()
+
+    def _check(self):
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+
+    def _submit(self):
+        next(b for b in self.at.button if "Ask" in b.label).click().run()
+        self._check()
+
+    def step(self, action):
+        at = self.at
+        if action == "category":
+            at.selectbox(key="category_select").select(self.mix.rng.choice(["All"] + self.mix.categories)).run()
+        elif action == "sample":
+            buttons = [b for b in at.sidebar.button if b.key and b.key.startswith("sidebar_q_")]
+            if not buttons:
+                action = "typed"
+            else:
+                self.mix.rng.choice(buttons).click().run()
+                self._submit()
+        elif action == "load_more":
+            more = [b for b in at.button if b.key == "load_more_btn"]
+            if more:
+                more[0].click().run()
+            else:
+                action = "typed"
+        if action == "typed":
+            at.text_input[0].input(self.mix.question())
+            self._submit()
+        self._check()
+        return action
+
+
+# ----------------------------- DRIVER -----------------------------
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def _warm_app(seed, timeout, log_dir, kb):
+    # keep synthetic traffic out of logs/query_log.db, which gap mining reads;
+    # one log per worker so they don't contend for the same SQLite file
+    os.environ["FAQ_QUERY_LOG"] = str(Path(log_dir) / f"query_log_{os.getpid()}.db")
+    # load modules and the process-wide cached index outside the measured window
+    logging.disable(logging.WARNING)
+    AppSession(QueryMix(seed), timeout, kb)
+
+
+def _app_student(n, seed, steps, timeout, trace_memory, kb):
+    """One AppSession in a worker process; returns (start, end, latencies, bytes held)"""
+    mix = QueryMix(seed + n)
+    if trace_memory:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+    start = time.time()
+    session = AppSession(mix, timeout, kb)
+    latencies = defaultdict(list)
+    for _ in range(steps):
+        action = mix.action()
+        t0 = time.perf_counter()
+        done = session.step(action)
+        latencies[done].append((time.perf_counter() - t0) * 1000)
+    end = time.time()
+    held = None
+    if trace_memory:
+        held = tracemalloc.get_traced_memory()[0] - base
+        tracemalloc.stop()
+    return start, end, dict(latencies), held
+
+
+def run_app(sessions, steps, concurrency, seed, trace_memory=False, timeout=120, kb=None):
+    """Drive app.py with one AppSession at a time per worker process.
+
+    AppTest is not thread-safe, so concurrency comes from ``concurrency``
+    processes, each with its own Streamlit runtime and index. Wall time
+    spans the first session start to the last session end, so worker
+    start-up and warm-up are not counted.
+    """
+    # AppTest swaps out sys.modules["__main__"] in the workers, so pickle the
+    # worker functions by their importable module name, not as __main__ ones
+    from load_test import _app_student, _warm_app
+
+    latencies = defaultdict(list)
+    spans, held = [], []
+    log_dir = tempfile.TemporaryDirectory()
+    with ProcessPoolExecutor(concurrency, initializer=_warm_app,
+                             initargs=(seed, timeout, log_dir.name, kb)) as pool:
+        student = partial(_app_student, seed=seed, steps=steps, timeout=timeout,
+                          trace_memory=trace_memory, kb=kb)
+        for start, end, samples, size in pool.map(student, range(sessions)):
+            spans.append((start, end))
+            held.append(size)
+            for action, values in samples.items():
+                latencies[action].extend(values)
+    log_dir.cleanup()
+    wall = max(e for _, e in spans) - min(s for s, _ in spans)
+    per_session = statistics.mean(held) if trace_memory else None
+    return {"latencies": latencies, "wall_s": wall, "bytes_per_session": per_session}
+
+
+def run(mode, sessions, steps, concurrency, seed, trace_memory=False, timeout=120, kb=None):
+    """Run ``sessions`` simulated students for ``steps`` actions each; return latencies per action.
+
+    With ``trace_memory`` the run is wrapped in tracemalloc to measure what
+    the sessions hold; that slows allocation, so latencies are inflated.
+    ``kb`` is the app's ``?kb=`` parameter: a knowledge base name, or ``all`` to fan out.
+    """
+    if mode == "app":
+        return run_app(sessions, steps, concurrency, seed, trace_memory, timeout, kb)
+
+    from query_log import QueryLog
+    from startup import build_index
+    registry = build_index()
+    # keep load-test traffic out of logs/query_log.db, which gap mining reads
+    log_dir = tempfile.TemporaryDirectory()
+    query_log = QueryLog(Path(log_dir.name) / "query_log.db")
+
+    latencies = defaultdict(list)
+    lock = threading.Lock()
+    alive = []
+
+    def student(n):
+        mix = QueryMix(seed + n)
+        session = InProcessSession(registry, query_log, mix, kb)
+        alive.append(session)
+        for _ in range(steps):
+            action = mix.action()
+            t0 = time.perf_counter()
+            done = session.step(action)
+            elapsed = (time.perf_counter() - t0) * 1000
+            with lock:
+                latencies[done].append(elapsed)
+
+    if trace_memory:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(student, range(sessions)))
+    wall = time.perf_counter() - t0
+    per_session = None
+    if trace_memory:
+        # every session is still referenced by ``alive``, so this is their combined footprint
+        per_session = (tracemalloc.get_traced_memory()[0] - base) / sessions
+        tracemalloc.stop()
+    query_log.close()
+    log_dir.cleanup()
+
+    return {"latencies": latencies, "wall_s": wall, "bytes_per_session": per_session}
+
+
+def report(result):
+    total = sum(len(v) for v in result["latencies"].values())
+    print(f"{total} actions in {result['wall_s']:.2f}s = {total / result['wall_s']:.1f} actions/s")
+    if result["bytes_per_session"] is not None:
+        print(f"memory held per session: {result['bytes_per_session'] / 1024:.1f} KiB")
+    print(f"{'action':<11}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for action, samples in sorted(result["latencies"].items()):
+        print(f"{action:<11}{len(samples):>7}{statistics.median(samples):>10.2f}"
+              f"{percentile(samples, 95):>10.2f}{percentile(samples, 99):>10.2f}{max(samples):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent students against the chatbot")
+    parser.add_argument("--mode", choices=["inprocess", "app"], default="inprocess",
+                        help="call the answer path directly, or drive app.py via Streamlit's AppTest "
+                             "(one process per concurrent session)")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=10, help="actions per session")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="measure memory held per session (slows the run)")
+    parser.add_argument("--kb", help="?kb= for every session: a knowledge base name, or 'all' to fan out")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    report(run(args.mode, args.sessions, args.steps, args.concurrency, args.seed,
+               trace_memory=args.trace_memory, kb=args.kb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+PROFILE_DIR = Path("logs") / "profile"
+
+
+# ----------------------------- RERUN PROFILER -----------------------------
+class NullProfiler:
+    """Stand-in used when profiling is off: every call is a no-op."""
+
+    enabled = False
+
+    def begin(self):
+        pass
+
+    def mark(self, section):
+        pass
+
+    def end(self):
+        pass
+
+
+class RerunProfiler:
+    """Per-section wall time and sampled stacks across Streamlit script reruns.
+
+    The script calls ``begin()`` at the top, ``mark(name)`` at the start of
+    each section (which also closes the previous one) and ``end()`` at the
+    bottom. Marking a section again later in the same rerun resumes it, so
+    its time is summed and the rerun is counted once. A rerun cut short by
+    ``st.rerun()``/``st.stop()`` is closed by the next ``begin()`` on that
+    thread. Timings and samples are kept per
+    section for the life of the process; several sessions may run at once,
+    each on its own script thread.
+    """
+
+    enabled = True
+
+    def __init__(self, interval=0.005, out_dir=PROFILE_DIR):
+        self.interval = interval
+        self.out_dir = Path(out_dir)
+        self.runs = 0
+        self.totals = Counter()
+        self.counts = Counter()
+        self.maxima = Counter()
+        self.stacks = Counter()
+        self._active = {}  # script thread id -> (section, start time)
+        self._current = {}  # script thread id -> section time so far in this rerun
+        self._lock = threading.Lock()
+        self._sampler = threading.Thread(target=self._sample, name="rerun-profiler", daemon=True)
+        self._sampler.start()
+
+    def begin(self):
+        tid = threading.get_ident()
+        self._close(tid)
+        self._finish(tid)
+        with self._lock:
+            self.runs += 1
+
+    def mark(self, section):
+        tid = threading.get_ident()
+        self._close(tid)
+        with self._lock:
+            self._active[tid] = (section, time.perf_counter())
+
+    def end(self):
+        tid = threading.get_ident()
+        self._close(tid)
+        self._finish(tid)
+
+    def _close(self, tid):
+        with self._lock:
+            current = self._active.pop(tid, None)
+            if current is None:
+                return
+            section, start = current
+            self._current.setdefault(tid, Counter())[section] += time.perf_counter() - start
+
+    def _finish(self, tid):
+        with self._lock:
+            for section, elapsed in self._current.pop(tid, Counter()).items():
+                self.totals[section] += elapsed
+                self.counts[section] += 1
+                self.maxima[section] = max(self.maxima[section], elapsed)
+
+    def _sample(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = {tid: section for tid, (section, _) in self._active.items()}
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for tid, section in active.items():
+                frame = frames.get(tid)
+                if frame is None or tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                key = ";".join([section] + stack[::-1])
+                with self._lock:
+                    self.stacks[key] += 1
+
+    def table(self):
+        """Rows of (section, reruns, mean ms, max ms, share of total) by total time"""
+        with self._lock:
+            grand = sum(self.totals.values()) or 1.0
+            return [
+                (s, self.counts[s], self.totals[s] / self.counts[s] * 1000,
+                 self.maxima[s] * 1000, self.totals[s] / grand)
+                for s, _ in self.totals.most_common()
+            ]
+
+    def write(self):
+        """Write collapsed stacks (flamegraph.pl / speedscope format), one file per section and one combined"""
+        with self._lock:
+            stacks = dict(self.stacks)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        by_section = {}
+        for key, n in stacks.items():
+            by_section.setdefault(key.split(";", 1)[0], []).append(f"{key} {n}")
+        with open(self.out_dir / "app.collapsed", "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for lines in by_section.values() for line in lines)
+        for section, lines in by_section.items():
+            with open(self.out_dir / f"{section}.collapsed", "w", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in lines)
+        return self.out_dir
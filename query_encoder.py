@@ -0,0 +1,222 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from queue import Empty, Queue
+
+import numpy as np
+
+
+# ----------------------------- ENCODERS -----------------------------
+class StubEncoder:
+    """Deterministic offline encoder: each token maps to a fixed pseudo-random unit vector.
+
+    Vectors depend only on the text, so runs are reproducible without a
+    model on disk. They do not live in the same space as a real model's,
+    so use it to exercise the query path, not to judge retrieval quality.
+    """
+
+    # not the model faq_embeddings.npy was built with; check_compatible skips
+    # the sample comparison, and the app only loads it when explicitly allowed
+    model_space = False
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self._tokens = {}
+
+    def _token_vector(self, token):
+        vec = self._tokens.get(token)
+        if vec is None:
+            seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            self._tokens[token] = vec
+        return vec
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                out[i] += self._token_vector(token)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms > 0, norms, 1.0)
+
+
+class SentenceTransformerEncoder:
+    """A sentence-transformers model loaded from a local directory, run on CPU."""
+
+    def __init__(self, model_dir):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("install sentence-transformers to encode queries with a local model") from e
+        self.model = SentenceTransformer(str(model_dir), device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        return self.model.encode(
+            list(texts), batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+
+
+class OnnxEncoder:
+    """A transformer exported to ONNX (``model.onnx`` + ``tokenizer.json``), mean-pooled and L2-normalised."""
+
+    def __init__(self, model_dir, max_length=128):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("install onnxruntime and tokenizers to encode queries with an ONNX model") from e
+        model_dir = Path(model_dir)
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            str(model_dir / "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    def encode(self, texts):
+        batch = self.tokenizer.encode_batch(list(texts))
+        ids = np.array([b.ids for b in batch], dtype=np.int64)
+        mask = np.array([b.attention_mask for b in batch], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feeds)[0]
+        summed = (hidden * mask[:, :, None]).sum(axis=1)
+        pooled = summed / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+        return (pooled / np.linalg.norm(pooled, axis=1, keepdims=True)).astype(np.float32)
+
+
+def load_encoder(spec):
+    """``stub`` for StubEncoder, or a model directory: ONNX if it has model.onnx, else sentence-transformers"""
+    if spec == "stub":
+        encoder = StubEncoder()
+    else:
+        model_dir = Path(spec)
+        if (model_dir / "model.onnx").exists():
+            encoder = OnnxEncoder(model_dir)
+        else:
+            encoder = SentenceTransformerEncoder(model_dir)
+    # recorded by calibrate.py with the thresholds it fits; the directory name,
+    # so the same model copied to another path still matches
+    encoder.name = spec if spec == "stub" else Path(spec).resolve().name
+    return encoder
+
+
+# ----------------------------- MICRO-BATCHING -----------------------------
+class BatchingEncoder:
+    """Group concurrent single-query encodes into one forward pass, with an LRU cache in front.
+
+    A request waits at most ``window_ms`` for others to join its batch (up
+    to ``max_batch`` texts); repeated queries are answered from the cache
+    without touching the model.
+    """
+
+    def __init__(self, encoder, max_batch=32, window_ms=3.0, cache_size=4096):
+        self.encoder = encoder
+        self.dim = encoder.dim
+        self.model_space = getattr(encoder, "model_space", True)
+        self.name = getattr(encoder, "name", type(encoder).__name__)
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._requests = Queue()
+        self._thread = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+        self._thread.start()
+
+    def encode(self, texts):
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        pending = []
+        with self._cache_lock:
+            for i, text in enumerate(texts):
+                vec = self._cache.get(text)
+                if vec is None:
+                    pending.append(i)
+                else:
+                    self._cache.move_to_end(text)
+                    out[i] = vec
+        futures = []
+        for i in pending:
+            future = Future()
+            self._requests.put((texts[i], future))
+            futures.append((i, future))
+        for i, future in futures:
+            out[i] = future.result()
+        return out
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except Empty:
+                    break
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vecs = dict(zip(texts, self.encoder.encode(texts)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._cache_lock:
+                for text, vec in vecs.items():
+                    self._cache[text] = vec
+                    self._cache.move_to_end(text)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            for text, future in batch:
+                future.set_result(vecs[text])
+
+
+# ----------------------------- COMPATIBILITY CHECK -----------------------------
+def check_compatible(encoder, embeddings, questions=None, sample=64, min_cosine=0.9, tol=1e-3):
+    """Raise ValueError unless ``encoder`` produces vectors comparable with the stored matrix.
+
+    Dimension and normalisation must agree. With ``questions`` (the texts
+    the rows of ``embeddings`` were encoded from), up to ``sample`` of them
+    are re-encoded and their mean cosine with the stored rows must reach
+    ``min_cosine``: a different model of the same size passes the shape
+    checks but not this one.
+    """
+    if embeddings.shape[1] != encoder.dim:
+        raise ValueError(
+            f"query encoder is {encoder.dim}-d but faq_embeddings.npy is {embeddings.shape[1]}-d"
+        )
+    stored = np.linalg.norm(np.asarray(embeddings[:256], dtype=np.float32), axis=1)
+    probe = np.linalg.norm(encoder.encode(["What programs are offered?", "hostel fee"]), axis=1)
+    stored_unit = bool(np.all(np.abs(stored - 1) < tol))
+    probe_unit = bool(np.all(np.abs(probe - 1) < tol))
+    if stored_unit != probe_unit:
+        raise ValueError(
+            "query encoder and faq_embeddings.npy disagree on normalisation "
+            f"(stored rows unit-length: {stored_unit}, encoded queries unit-length: {probe_unit})"
+        )
+    if questions is None or not getattr(encoder, "model_space", True):
+        return
+    rows = np.unique(np.linspace(0, len(questions) - 1, min(sample, len(questions))).astype(int))
+    encoded = encoder.encode([questions[r] for r in rows])
+    stored = np.asarray(embeddings[rows], dtype=np.float32)
+    cos = (encoded * stored).sum(axis=1) / (
+        np.linalg.norm(encoded, axis=1) * np.linalg.norm(stored, axis=1) + 1e-12
+    )
+    if cos.mean() < min_cosine:
+        raise ValueError(
+            f"query encoder does not reproduce faq_embeddings.npy: re-encoding {len(rows)} stored "
+            f"questions gives mean cosine {cos.mean():.3f} (worst {cos.min():.3f}), "
+            f"expected at least {min_cosine}; use the model the embeddings were built with"
+        )
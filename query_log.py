@@ -0,0 +1,201 @@
+import argparse
+import atexit
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+DEFAULT_DB = Path("logs") / "query_log.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    ts REAL NOT NULL,
+    session_id TEXT,
+    query TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    shard TEXT,
+    row INTEGER,
+    score REAL,
+    latency_ms REAL
+)
+"""
+
+INSERT = ("INSERT INTO queries (ts, session_id, query, kind, shard, row, score, latency_ms) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+# ----------------------------- QUERY LOGGER -----------------------------
+class QueryLog:
+    """Append-only query log.
+
+    ``record`` only appends to an in-memory ring buffer; a daemon thread
+    drains it in batches into SQLite, so callers never wait on disk. When
+    the buffer is full the oldest pending records are dropped (and counted)
+    instead of blocking the caller. Whatever is still buffered when the
+    process exits is written by an ``atexit`` hook.
+    """
+
+    def __init__(self, path=DEFAULT_DB, capacity=10000, batch_size=256, flush_interval=1.0):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._buffer = deque(maxlen=capacity)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, query, kind, shard=None, row=None, score=None, latency_ms=None, session_id=None):
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append((time.time(), session_id, query, kind, shard, row, score, latency_ms))
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    def flush(self, timeout=5.0):
+        """Block until everything recorded so far has been written."""
+        done = threading.Event()
+        self._buffer.append(done)
+        self._wake.set()
+        return done.wait(timeout)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute(SCHEMA)
+        columns = [r[1] for r in conn.execute("PRAGMA table_info(queries)")]
+        if "shard" not in columns:
+            # logs written before knowledge bases were sharded
+            conn.execute("ALTER TABLE queries ADD COLUMN shard TEXT")
+        conn.commit()
+        try:
+            while True:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self._drain(conn)
+                if self._stop.is_set():
+                    break
+        finally:
+            conn.close()
+
+    def _drain(self, conn):
+        while self._buffer:
+            batch = []
+            waiters = []
+            while self._buffer and len(batch) < self.batch_size:
+                item = self._buffer.popleft()
+                if isinstance(item, threading.Event):
+                    # flush() marker: everything queued before it is in this batch
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+            if batch:
+                conn.executemany(INSERT, batch)
+                conn.commit()
+            for w in waiters:
+                w.set()
+
+
+# ----------------------------- OFFLINE REPORT -----------------------------
+def iter_unanswered(db_path=DEFAULT_DB, chunk_size=10000):
+    """Yield lists of below-threshold queries from the log, one chunk at a time."""
+    conn = sqlite3.connect(db_path)
+    try:
+        cur = conn.execute("SELECT query FROM queries WHERE kind = 'miss'")
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [r[0] for r in rows]
+    finally:
+        conn.close()
+
+
+def top_unanswered(db_path=DEFAULT_DB, top=20, threshold=0.5, max_clusters=5000, block=1024):
+    """Group unanswered queries into clusters of similar wording.
+
+    Distinct queries are visited from most to least frequent; each one joins
+    the cluster whose representative it matches best, provided the cosine
+    similarity is >= ``threshold``, otherwise it starts a new cluster.
+    Queries are compared ``block`` at a time with one sparse product against
+    the representatives so far (plus one within the block), and once
+    ``max_clusters`` exist the rarer queries can still join one but no
+    longer start their own, so the cost stays linear in distinct queries.
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    counts = {}
+    for chunk in iter_unanswered(db_path):
+        for q in chunk:
+            key = q.lower().strip()
+            counts[key] = counts.get(key, 0) + 1
+    if not counts:
+        return []
+
+    texts = sorted(counts, key=counts.get, reverse=True)
+    vecs = TfidfVectorizer().fit_transform(texts)
+    reps = []
+    clusters = []
+    for start in range(0, len(texts), block):
+        chunk = vecs[start:start + block]
+        known = len(reps)
+        to_known = (chunk @ vecs[reps].T).toarray() if reps else None
+        within = (chunk @ chunk.T).toarray()
+        started = []  # block-local positions of clusters started in this block
+        for j in range(chunk.shape[0]):
+            text = texts[start + j]
+            best, best_sim = -1, -1.0
+            if known:
+                best = int(to_known[j].argmax())
+                best_sim = to_known[j, best]
+            if started:
+                sims = within[j, started]
+                k = int(sims.argmax())
+                if sims[k] > best_sim:
+                    best, best_sim = known + k, sims[k]
+            if best >= 0 and best_sim >= threshold:
+                clusters[best]["count"] += counts[text]
+                clusters[best]["examples"].append(text)
+            elif len(reps) < max_clusters:
+                reps.append(start + j)
+                started.append(j)
+                clusters.append({"query": text, "count": counts[text], "examples": [text]})
+
+    clusters.sort(key=lambda c: c["count"], reverse=True)
+    return clusters[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query log tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="Top unanswered queries, clustered by similarity")
+    report.add_argument("--db", default=str(DEFAULT_DB))
+    report.add_argument("--top", type=int, default=20)
+    report.add_argument("--threshold", type=float, default=0.5)
+    report.add_argument("--examples", type=int, default=3)
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        parser.error(f"no query log at {args.db}")
+
+    clusters = top_unanswered(args.db, top=args.top, threshold=args.threshold)
+    if not clusters:
+        print("No unanswered queries logged.")
+        return
+    for n, c in enumerate(clusters, 1):
+        print(f"{n:>3}. [{c['count']}] {c['query']}")
+        for ex in c["examples"][1:args.examples + 1]:
+            print(f"       - {ex}")
+
+
+if __name__ == "__main__":
+    main()
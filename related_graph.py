@@ -0,0 +1,100 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+RELATED_FILE = "faq_related.npz"
+
+
+# ----------------------------- RELATED-QUESTIONS GRAPH -----------------------------
+class RelatedGraph:
+    """k-nearest-neighbour graph over FAQ rows in CSR form.
+
+    The neighbours of row ``r`` are ``indices[indptr[r]:indptr[r + 1]]``,
+    best first, with their similarities in ``scores``; serving them is a
+    slice, not a similarity scan. ``checksum`` identifies the questions it
+    was built from (see faq_index.texts_checksum).
+    """
+
+    def __init__(self, indptr, indices, scores, checksum=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+        self.checksum = checksum
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def neighbours(self, row, k=None):
+        start, end = self.indptr[row], self.indptr[row + 1]
+        if k is not None:
+            end = min(end, start + k)
+        return self.indices[start:end]
+
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.scores.nbytes
+
+    @classmethod
+    def build(cls, q_vecs, embeddings=None, k=5, dense_weight=0.5, block=1024, checksum=None):
+        """Blend TF-IDF and dense cosine similarity and keep each row's ``k`` best neighbours.
+
+        Similarities are computed ``block`` rows at a time, so memory is
+        ``block x rows`` rather than ``rows x rows``.
+        """
+        n = q_vecs.shape[0]
+        k = max(min(k, n - 1), 0)
+        if embeddings is not None:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+        indices = np.empty((n, k), dtype=np.int32)
+        scores = np.empty((n, k), dtype=np.float32)
+
+        for start in range(0, n, block):
+            end = min(start + block, n)
+            sims = (q_vecs[start:end] @ q_vecs.T).toarray().astype(np.float32)
+            if embeddings is not None:
+                sims = (1 - dense_weight) * sims + dense_weight * (embeddings[start:end] @ embeddings.T)
+            # never suggest the row itself
+            sims[np.arange(end - start), np.arange(start, end)] = -np.inf
+            if k <= 0:
+                continue
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            indices[start:end] = np.take_along_axis(top, order, axis=1)
+            scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+
+        indptr = (np.arange(n + 1) * k).astype(np.int32)
+        return cls(indptr, indices.ravel(), scores.ravel(), checksum)
+
+    def save(self, path):
+        np.savez_compressed(path, indptr=self.indptr, indices=self.indices, scores=self.scores,
+                            checksum=np.array(self.checksum or ""))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            checksum = str(z["checksum"]) if "checksum" in z.files else None
+            return cls(z["indptr"], z["indices"], z["scores"], checksum or None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the related-questions graph")
+    parser.add_argument("--data", default="embeddings")
+    parser.add_argument("-k", type=int, default=5, help="neighbours stored per row")
+    parser.add_argument("--dense-weight", type=float, default=0.5,
+                        help="share of faq_embeddings.npy similarity versus TF-IDF")
+    parser.add_argument("--block", type=int, default=1024)
+    args = parser.parse_args()
+
+    from faq_index import FAQIndex, texts_checksum
+    index = FAQIndex(args.data)
+    graph = RelatedGraph.build(index.q_vecs, index.embeddings, k=args.k,
+                               dense_weight=args.dense_weight, block=args.block,
+                               checksum=texts_checksum(index.questions))
+    out = Path(args.data) / RELATED_FILE
+    graph.save(out)
+    print(f"{len(graph)} rows x {args.k} neighbours, {graph.nbytes() / 1024:.1f} KiB -> {out}")
+
+
+if __name__ == "__main__":
+    main()
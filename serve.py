@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+from startup import get_index_loader
+
+APP = Path(__file__).resolve().parent / "app.py"
+
+
+def main():
+    """Start the index warmup, then serve app.py in this process.
+
+    Use instead of ``streamlit run app.py`` where a readiness probe gates
+    traffic: the index loads (and FAQ_READY_FILE appears) as soon as the
+    process starts, not when the first browser connects. Arguments are
+    passed on to ``streamlit run``, e.g. ``python serve.py --server.port 8080``.
+    """
+    get_index_loader()
+    from streamlit.web import cli as stcli
+    sys.argv = ["streamlit", "run", str(APP), *sys.argv[1:]]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
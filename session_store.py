@@ -0,0 +1,202 @@
+import atexit
+import html
+import json
+import queue
+import sqlite3
+import threading
+import time
+import warnings
+from collections import deque
+from pathlib import Path
+
+DEFAULT_DB = Path("logs") / "sessions.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    token TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    sender TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (token, seq)
+)
+"""
+
+
+# ----------------------------- CONNECTION POOL -----------------------------
+class ConnectionPool:
+    """A fixed set of SQLite connections in WAL mode, so readers don't block the writer."""
+
+    def __init__(self, path, size=4):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._pool = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._pool.put(conn)
+        with self.connection() as conn:
+            conn.execute(SCHEMA)
+            conn.commit()
+
+    def connection(self):
+        return _Borrowed(self._pool)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class _Borrowed:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __enter__(self):
+        self.conn = self.pool.get()
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.pool.put(self.conn)
+
+
+# ----------------------------- SESSION STORE -----------------------------
+class SessionStore:
+    """Chat history keyed by session token.
+
+    Writes (``append``, ``clear``) are queued and applied in order by a
+    background thread in batched transactions, like QueryLog; only
+    ``load`` reads synchronously, once when a session resumes. At most
+    ``capacity`` writes wait in the queue; appends beyond that are dropped
+    (and counted) instead of growing memory while the database is
+    unavailable. A batch that fails because the database is locked is
+    retried on the next pass, and whatever is still queued when the
+    process exits is written by an ``atexit`` hook.
+    """
+
+    def __init__(self, path=DEFAULT_DB, pool_size=4, capacity=10000, batch_size=128, flush_interval=0.5):
+        self.pool = ConnectionPool(path, pool_size)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._ops = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="session-store-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, token, seq, sender, text):
+        if len(self._ops) >= self.capacity:
+            # drop the new message rather than an older clear() or flush() marker
+            self.dropped += 1
+            return
+        self._ops.append(("append", (token, seq, time.time(), sender, text)))
+        if len(self._ops) >= self.batch_size:
+            self._wake.set()
+
+    def clear(self, token):
+        self._ops.append(("clear", (token,)))
+        self._wake.set()
+
+    def load(self, token):
+        """History of ``token`` as [(sender, text), ...] in order"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT sender, text FROM messages WHERE token = ? ORDER BY seq", (token,)
+            ).fetchall()
+        return [tuple(r) for r in rows]
+
+    def flush(self, timeout=5.0):
+        """Block until every queued write has been committed."""
+        done = threading.Event()
+        self._ops.append(("flush", done))
+        self._wake.set()
+        return done.wait(timeout)
+
+    def close(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.pool.close()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._ops:
+                try:
+                    with self.pool.connection() as conn:
+                        self._drain(conn)
+                except sqlite3.OperationalError as e:
+                    pending = "lost" if self._stop.is_set() else "kept for retry"
+                    warnings.warn(f"session store write failed ({e}); {len(self._ops)} queued writes {pending}")
+                except Exception as e:
+                    warnings.warn(f"session store write failed ({e}); batch dropped")
+            if self._stop.is_set():
+                break
+
+    def _drain(self, conn):
+        while self._ops:
+            batch = [self._ops.popleft() for _ in range(min(self.batch_size, len(self._ops)))]
+            waiters = []
+            try:
+                with conn:
+                    for op, args in batch:
+                        if op == "append":
+                            conn.execute("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?)", args)
+                        elif op == "clear":
+                            conn.execute("DELETE FROM messages WHERE token = ?", args)
+                        else:
+                            waiters.append(args)
+            except sqlite3.OperationalError:
+                # e.g. database is locked: the transaction was rolled back, so requeue it in order
+                self._ops.extendleft(reversed(batch))
+                raise
+            except Exception:
+                self.dropped += sum(op == "append" for op, _ in batch)
+                raise
+            for w in waiters:
+                w.set()
+
+
+# ----------------------------- EXPORT -----------------------------
+def export_json(history):
+    return json.dumps(
+        [{"sender": sender, "text": text} for sender, text in history], ensure_ascii=False, indent=2
+    )
+
+
+def export_html(history, title="UET Taxila AI Assistant - Conversation"):
+    """Standalone HTML page of the conversation, laid out for printing to PDF"""
+    rows = "\n".join(
+        f"<div class='msg {'user' if sender == 'You' else 'bot'}'>"
+        f"<div class='who'>{'👤 You' if sender == 'You' else '🤖 Assistant'}</div>"
+        f"<div class='text'>{html.escape(text)}</div></div>"
+        for sender, text in history
+    )
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{html.escape(title)}</title>
+<style>
+@page {{ size: A4; margin: 18mm; }}
+body {{ font-family: 'Inter', Arial, sans-serif; color: #2c3e50; }}
+h1 {{ font-size: 20px; color: #1a4d7a; border-bottom: 3px solid #3a7bb5; padding-bottom: 8px; }}
+.msg {{ padding: 10px 14px; margin: 10px 0; border-radius: 6px; page-break-inside: avoid; }}
+.user {{ background: #e3f2fd; border-left: 4px solid #3a7bb5; }}
+.bot {{ background: #f5f5f5; border-left: 4px solid #d4af37; }}
+.who {{ font-size: 12px; font-weight: 600; color: #1a4d7a; margin-bottom: 4px; }}
+.text {{ font-size: 14px; line-height: 1.6; white-space: pre-wrap; }}
+</style>
+</head>
+<body>
+<h1>{html.escape(title)}</h1>
+{rows}
+</body>
+</html>
+"""
@@ -0,0 +1,150 @@
+import heapq
+import json
+import threading
+import warnings
+from collections import OrderedDict
+from pathlib import Path
+
+from faq_index import DATA_PATH, FAQIndex
+
+CONFIG_FILE = Path("knowledge_bases.json")
+DEFAULT_SHARD = "main"
+
+
+# ----------------------------- SHARD REGISTRY -----------------------------
+class ShardRegistry:
+    """Named FAQ knowledge bases, loaded on first use and evicted least-recently-used.
+
+    ``knowledge_bases.json`` (optional) looks like::
+
+        {
+          "default": "main",
+          "max_loaded": 4,
+          "max_mb": 256,
+          "shards": {
+            "main": {"path": "embeddings", "title": "Main Campus"},
+            "cs": {"path": "knowledge_bases/cs", "title": "Computer Science",
+                   "categories": ["Programs"]}
+          }
+        }
+
+    Each shard directory has the same files as ``embeddings/``. Without the
+    file there is a single ``main`` shard backed by ``embeddings/``. The
+    default shard is never evicted: it is also what predicts a query's
+    category for routing.
+    """
+
+    def __init__(self, config=None, encoder=None, dense_weight=0.5):
+        config = config or {}
+        self.encoder = encoder
+        self.dense_weight = dense_weight
+        self.shards = config.get("shards") or {DEFAULT_SHARD: {"path": str(DATA_PATH)}}
+        self.default = config.get("default", DEFAULT_SHARD if DEFAULT_SHARD in self.shards
+                                  else next(iter(self.shards)))
+        self.max_loaded = config.get("max_loaded", 4)
+        self.max_bytes = config.get("max_mb", 0) * 1024 * 1024
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {name: threading.Lock() for name in self.shards}
+        self._category_owner = {}
+        for name, spec in self.shards.items():
+            for category in spec.get("categories", ()):
+                self._category_owner.setdefault(category, name)
+
+    @classmethod
+    def from_file(cls, path=CONFIG_FILE, **kwargs):
+        path = Path(path)
+        if not path.exists():
+            return cls(**kwargs)
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def names(self):
+        return list(self.shards)
+
+    def title(self, name):
+        return self.shards[name].get("title", name)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._loaded)
+
+    def get(self, name=None):
+        name = name or self.default
+        if name not in self.shards:
+            raise KeyError(f"unknown knowledge base: {name}")
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                return self._loaded[name]
+        # one loader per shard; other shards stay available while it runs
+        with self._loading[name]:
+            with self._lock:
+                if name in self._loaded:
+                    return self._loaded[name]
+            index = FAQIndex(self.shards[name]["path"], self.encoder, self.dense_weight)
+            with self._lock:
+                self._loaded[name] = index
+                self._evict(keep=name)
+            return index
+
+    def _evict(self, keep):
+        """Drop least-recently-used shards until within budget, never the default or ``keep``"""
+        def over_budget():
+            if len(self._loaded) > self.max_loaded:
+                return True
+            return self.max_bytes and sum(i.nbytes() for i in self._loaded.values()) > self.max_bytes
+
+        for name in list(self._loaded):
+            if not over_budget():
+                break
+            if name not in (self.default, keep):
+                del self._loaded[name]
+        if over_budget():
+            # evicting ``keep`` would only reload it on the next call
+            warnings.warn(
+                f"knowledge bases {', '.join(self._loaded)} exceed max_loaded {self.max_loaded} / "
+                f"max_mb {self.max_bytes / (1024 * 1024):g}; raise the limits"
+            )
+
+    def route(self, kb=None, query=None):
+        """Pick a shard name: explicit ``kb`` (e.g. a URL parameter) first, then predicted category.
+
+        The category is that of the default shard's best match for ``query``;
+        the first shard declaring it under ``categories`` wins.
+        """
+        if kb in self.shards:
+            return kb
+        if query and self._category_owner:
+            router = self.get(self.default)
+            row, _, accepted = router.match(query)
+            if accepted:
+                return self._category_owner.get(router.categories[row], self.default)
+        return self.default
+
+    def search(self, query, k=5, names=None):
+        """Fan a query out to several shards and merge their top-k as (score, shard, row).
+
+        Only shards that fit within ``max_loaded``/``max_mb`` are searched,
+        resident ones first: loading the rest would evict others and refit
+        them on every query. Skipped shards raise a warning; raise the
+        limits to cover them.
+        """
+        names = names or self.names()
+        with self._lock:
+            resident = [n for n in names if n in self._loaded]
+            room = self.max_loaded - len(self._loaded)
+            if self.max_bytes and sum(i.nbytes() for i in self._loaded.values()) >= self.max_bytes:
+                room = 0
+        missing = [n for n in names if n not in resident]
+        skipped = missing[max(room, 0):]
+        if skipped:
+            warnings.warn(
+                f"fan-out covers {len(names)} knowledge bases but only {len(names) - len(skipped)} "
+                f"fit in memory (max_loaded {self.max_loaded}); skipping {', '.join(skipped)}"
+            )
+        hits = []
+        for name in resident + missing[:max(room, 0)]:
+            index = self.get(name)
+            hits.extend((score, name, row) for row, score in index.top_k(query, k))
+        return heapq.nlargest(k, hits)
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+
+# ----------------------------- BACKGROUND WARMUP -----------------------------
+class IndexLoader:
+    """Build the FAQ index on a background thread.
+
+    ``factory`` is called once on the warmup thread, so whatever it imports
+    (sklearn, numpy, pickles) stays off the path that renders the page shell.
+    ``get`` blocks until the index is hot; ``ready`` can be polled without
+    blocking. When ``ready_file`` is set it is created once loading succeeds,
+    which an exec readiness probe can check with ``test -f``.
+    """
+
+    def __init__(self, factory, ready_file=None):
+        self.factory = factory
+        self.ready_file = Path(ready_file) if ready_file else None
+        self.load_ms = None
+        self._index = None
+        self._error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="index-warmup", daemon=True)
+
+    def start(self):
+        if self.ready_file:
+            # a file left by an earlier run of this container must not report ready early
+            self.ready_file.unlink(missing_ok=True)
+        self._thread.start()
+        return self
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self._error is None
+
+    def get(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("FAQ index is still loading")
+        if self._error is not None:
+            raise self._error
+        return self._index
+
+    def _run(self):
+        t0 = time.perf_counter()
+        try:
+            self._index = self.factory()
+        except Exception as e:
+            self._error = e
+        else:
+            self.load_ms = (time.perf_counter() - t0) * 1000
+            if self.ready_file:
+                self.ready_file.parent.mkdir(parents=True, exist_ok=True)
+                self.ready_file.touch()
+        finally:
+            self._done.set()
+
+
+# ----------------------------- PROCESS-WIDE LOADER -----------------------------
+def build_index():
+    # sklearn/numpy are only imported here, on the warmup thread
+    from shards import ShardRegistry
+    encoder = None
+    spec = os.environ.get("FAQ_QUERY_ENCODER")
+    if spec:
+        # a local model directory; see query_encoder.load_encoder
+        if spec == "stub" and os.environ.get("FAQ_ALLOW_STUB_ENCODER") != "1":
+            raise ValueError("FAQ_QUERY_ENCODER=stub is not in the faq_embeddings.npy space and "
+                             "degrades every answer; set FAQ_ALLOW_STUB_ENCODER=1 to use it for tests")
+        from query_encoder import BatchingEncoder, load_encoder
+        encoder = BatchingEncoder(load_encoder(spec))
+    registry = ShardRegistry.from_file(
+        encoder=encoder, dense_weight=float(os.environ.get("FAQ_DENSE_WEIGHT", "0.5"))
+    )
+    registry.get()  # the default knowledge base is hot before we report ready
+    return registry
+
+
+_loader = None
+_loader_lock = threading.Lock()
+
+
+def get_index_loader():
+    """The process's IndexLoader, started on the first call.
+
+    serve.py calls this before the server starts, so the index (and
+    FAQ_READY_FILE) is ready without waiting for a browser session; under a
+    plain ``streamlit run`` the first session starts it instead.
+    """
+    global _loader
+    with _loader_lock:
+        if _loader is None:
+            _loader = IndexLoader(build_index, ready_file=os.environ.get("FAQ_READY_FILE")).start()
+        return _loader
+
+
+def reset_index_loader(loader):
+    """Forget a failed ``loader`` so the next get_index_loader() tries again"""
+    global _loader
+    with _loader_lock:
+        if _loader is loader:
+            _loader = None